@@ -0,0 +1,128 @@
+"""
+Summarise a Bruh Bot event log (ENABLE_EVENT_LOG=true, one JSON object per line).
+
+Prints p50/p95/p99 latencies for every stage that reports dur_ms, split per
+provider for LLM requests, plus reply throughput, failure counts and token
+totals.
+
+Usage:
+    python analyze_events.py [logs/events.jsonl ...] [--since MINUTES]
+"""
+import argparse
+import json
+import math
+import pathlib
+import sys
+import time
+from collections import Counter, defaultdict
+
+DEFAULT_LOG = pathlib.Path(__file__).parent / "logs" / "events.jsonl"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def read_events(paths: list[pathlib.Path], since: float | None) -> list[dict]:
+    events = []
+    bad = 0
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        ev = json.loads(line)
+                    except json.JSONDecodeError:
+                        bad += 1
+                        continue
+                    if since is None or ev.get("ts", 0) >= since:
+                        events.append(ev)
+        except FileNotFoundError:
+            print(f"⚠️  {path} not found", file=sys.stderr)
+    if bad:
+        print(f"⚠️  Skipped {bad} malformed line(s)", file=sys.stderr)
+    events.sort(key=lambda ev: ev.get("ts", 0))
+    return events
+
+
+def stage_name(ev: dict) -> str:
+    name = ev["event"]
+    if name in ("llm_request_end", "llm_request_start") and ev.get("target"):
+        return f"{name} [{ev['target']}]"
+    if name == "reply_sent" and ev.get("path"):
+        return f"{name} [{ev['path']}]"
+    return name
+
+
+def report(events: list[dict]):
+    if not events:
+        print("No events.")
+        return
+
+    durations: dict[str, list[float]] = defaultdict(list)
+    counts: Counter[str] = Counter()
+    failures: Counter[str] = Counter()
+    tokens: Counter[str] = Counter()
+
+    for ev in events:
+        name = ev.get("event")
+        if not name:
+            continue
+        counts[name] += 1
+        if isinstance(ev.get("dur_ms"), (int, float)):
+            durations[stage_name(ev)].append(float(ev["dur_ms"]))
+            if name == "reply_sent":
+                durations["reply_sent (all)"].append(float(ev["dur_ms"]))
+        if name == "llm_request_end":
+            if not ev.get("ok"):
+                failures[f"{ev.get('target')}: {ev.get('error') or 'empty reply'}"] += 1
+            for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                if isinstance(ev.get(key), int):
+                    tokens[key] += ev[key]
+
+    span = events[-1].get("ts", 0) - events[0].get("ts", 0)
+    print(f"{len(events)} events over {span / 60:.1f} min")
+    print()
+
+    width = max(len(name) for name in durations) if durations else 10
+    print(f"{'stage':<{width}}  {'count':>6}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'max':>8}  (ms)")
+    for name in sorted(durations):
+        values = sorted(durations[name])
+        print(
+            f"{name:<{width}}  {len(values):>6}  {percentile(values, 50):>8.1f}  "
+            f"{percentile(values, 95):>8.1f}  {percentile(values, 99):>8.1f}  {values[-1]:>8.1f}"
+        )
+    print()
+
+    replies = counts["reply_sent"]
+    if span > 0:
+        print(f"Throughput: {replies / (span / 60):.2f} replies/min, "
+              f"{counts['llm_request_end'] / (span / 60):.2f} LLM requests/min")
+    print("Counts: " + ", ".join(f"{name}={n}" for name, n in sorted(counts.items())))
+    if failures:
+        print("LLM failures:")
+        for key, n in failures.most_common():
+            print(f"  {n:>5}  {key}")
+    if tokens:
+        print("Tokens: " + ", ".join(f"{key}={n:,}" for key, n in sorted(tokens.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency report for the Bruh Bot event log.")
+    parser.add_argument("paths", nargs="*", type=pathlib.Path, default=[DEFAULT_LOG],
+                        help="event log file(s), including rotated ones (default: logs/events.jsonl)")
+    parser.add_argument("--since", type=float, metavar="MINUTES",
+                        help="only include events from the last MINUTES minutes")
+    args = parser.parse_args()
+
+    since = time.time() - args.since * 60 if args.since else None
+    report(read_events(args.paths, since))
+
+
+if __name__ == "__main__":
+    main()
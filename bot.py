@@ -8,16 +8,42 @@ import os
 import pathlib
 import traceback
 import re
+import functools
+import heapq
 import aiohttp
 import asyncio
 import base64
+import hashlib
 import logging
+import logging.handlers
+import queue
+import atexit
 import json
+import time
+import tempfile
+import contextlib
+import contextvars
+import shutil
+import subprocess
+import urllib.parse
+from collections import Counter, OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable
 from datetime import datetime, timezone, timedelta
 from discord.ext import commands
 from discord import app_commands
 import io
-from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+try:
+    import fcntl   # POSIX only; file locking is skipped on Windows
+except ImportError:
+    fcntl = None
+
+try:
+    import watchfiles   # optional: OS file-change notifications for hot reload
+except ImportError:
+    watchfiles = None
 
 # ============================================================
 # CONFIGURATION
@@ -53,6 +79,16 @@ MENTION_MSGS_FILE=mention_msgs.txt
 # Example: user types !rules → bot sends contents of commands/rules.txt
 COMMANDS_FOLDER=commands
 
+# Extra names for prefix commands, comma-separated alias:command pairs.
+# An alias only applies if there is no <alias>.txt file of its own.
+COMMAND_ALIASES=list:help,chunk_generation:chunk_lag
+
+# Hot reload: edits to the message files, the commands folder and PROMPT.txt take effect
+# without a restart. Uses OS file notifications if the optional "watchfiles" package is
+# installed, otherwise checks file modification times every HOT_RELOAD_POLL_SECONDS.
+ENABLE_HOT_RELOAD=true
+HOT_RELOAD_POLL_SECONDS=2
+
 
 
 # --- Channel IDs ---
@@ -246,6 +282,24 @@ LLM_FALLBACK_MSG=
 # Show a typing indicator while waiting for the LLM response
 LLM_TYPING_INDICATOR=true
 
+# Stream replies: post the first words as soon as the LLM produces them and edit the
+# message as the rest arrives. Supported by ollama, ollama_cloud, anthropic, gemini and
+# the OpenAI-compatible providers (openmodel always waits for the full reply).
+LLM_STREAMING=false
+
+# Minimum milliseconds between message edits while streaming (Discord rate-limits edits)
+LLM_STREAM_EDIT_INTERVAL_MS=1500
+
+# Keep the system prompt byte-identical on every request: the per-message details (who is
+# talking, which channel, voice/shitpost instructions) are sent with the latest message
+# instead. Lets Ollama reuse its KV cache and Anthropic/OpenAI/Gemini serve the prompt
+# from their prompt cache, which makes replies faster and cheaper with a long PROMPT.txt.
+LLM_STABLE_PROMPT_PREFIX=false
+
+# How long Ollama keeps the model loaded after a request (e.g. 30m, 2h, -1 = forever).
+# Leave blank for Ollama's default (5 minutes).
+LLM_OLLAMA_KEEP_ALIVE=
+
 # If ENABLE_LLM=true and LLM_PERCENTAGE=true, the bot will only respond with
 # the LLM LLM_PERCENTAGE_VALUE% of the time. The rest of the time it silently
 # drops the mention (no response at all). Set to false to always answer.
@@ -260,6 +314,44 @@ LLM_PERCENTAGE_VALUE=75
 # Recommended: 15-30. Set to 0 to disable context fetching.
 LLM_CONTEXT_MESSAGES=20
 
+# Token budget for the whole prompt (system prompt + context + message). The oldest
+# context messages are dropped until it fits, so a few pasted crash logs can't blow up the
+# prompt while a chat of one-word messages still gets plenty of context.
+# Tokens are estimated (~4 bytes each). 0 = no budget, use LLM_CONTEXT_MESSAGES only.
+LLM_CONTEXT_TOKENS=3000
+
+# Per provider/model budgets that override LLM_CONTEXT_TOKENS, comma-separated
+# provider=tokens or provider:model=tokens, e.g. ollama=2000,anthropic=12000
+LLM_CONTEXT_TOKEN_BUDGETS=
+
+# Context messages longer than this many tokens are cut short (0 = never cut)
+LLM_CONTEXT_MESSAGE_MAX_TOKENS=300
+
+# Rolling channel summaries: every few minutes, older messages in channels where the bot
+# has been mentioned or replied are condensed into a short summary by the LLM (at the
+# lowest priority, when it's not busy).
+# Summaries are saved to disk and sent with every reply together with only a short tail
+# of recent messages - longer memory with a smaller prompt. /clear-memory resets a channel.
+ENABLE_LLM_SUMMARY=false
+# How often (in minutes) channels are checked for new messages to summarize.
+# Busy channels are also summarized early, before unsummarized messages fall out of
+# the LLM_HISTORY_CACHE_SIZE message buffer.
+LLM_SUMMARY_INTERVAL_MINUTES=10
+# A channel is summarized again once it has at least this many new messages
+LLM_SUMMARY_MIN_NEW_MESSAGES=10
+# Recent raw messages sent alongside the summary (instead of LLM_CONTEXT_MESSAGES)
+LLM_SUMMARY_TAIL_MESSAGES=8
+# File to store channel summaries (relative to bot script directory)
+LLM_SUMMARY_FILE=channel_summaries.json
+
+# Recent messages are kept in memory per channel (fed by live Discord events), so
+# context is read from RAM instead of an API call on every reply. Each channel is
+# fetched over the API only once, the first time it is needed after a restart.
+# Messages remembered per channel (always at least LLM_CONTEXT_MESSAGES)
+LLM_HISTORY_CACHE_SIZE=50
+# Max channels kept in memory (least recently active channels are dropped first)
+LLM_HISTORY_CACHE_CHANNELS=200
+
 # Enable vision: bot will read image attachments when mentioned
 # Requires a vision-capable model (e.g. gpt-4o, claude-3-5-sonnet-20241022,
 # gemini-1.5-flash, llava for ollama)
@@ -268,6 +360,86 @@ ENABLE_LLM_VISION=false
 # Max image size in MB to process (images larger than this are skipped)
 LLM_VISION_MAX_MB=10
 
+# Max images downloaded at the same time for vision
+LLM_VISION_CONCURRENCY=4
+
+# Downscale and re-encode images before sending them to the LLM. Keeps requests small
+# (a multi-MB phone screenshot becomes a few hundred KB) and strips photo metadata.
+ENABLE_LLM_VISION_RESIZE=true
+
+# Longest image edge in pixels after downscaling
+LLM_VISION_MAX_EDGE=1568
+
+# Re-encode format: jpeg or webp
+LLM_VISION_FORMAT=jpeg
+
+# Re-encode quality (1-100)
+LLM_VISION_QUALITY=85
+
+# All LLM requests share one long-lived HTTP connection pool, so TLS handshakes and
+# DNS lookups to the provider are reused instead of repeated on every message.
+# Max simultaneous connections to a single provider host
+LLM_HTTP_MAX_CONNECTIONS_PER_HOST=8
+# Seconds an idle connection is kept open for reuse
+LLM_HTTP_KEEPALIVE_SECONDS=60
+# Seconds resolved DNS entries are cached (0 = no DNS caching)
+LLM_HTTP_DNS_CACHE_SECONDS=300
+
+# Reuse the reply for an identical prompt instead of asking the LLM again.
+# A cached reply is only reused for the same provider, model, system prompt, person
+# and recent conversation. Prompts with images are never cached.
+ENABLE_LLM_CACHE=false
+# Seconds a cached reply stays valid
+LLM_CACHE_TTL_SECONDS=300
+# Max cached replies (least recently used are dropped first)
+LLM_CACHE_MAX_ENTRIES=256
+# How many recent messages from other people must also match for a cache hit.
+# Higher = fewer hits but replies always fit the conversation. 0 = match on prompt only.
+LLM_CACHE_CONTEXT_MESSAGES=2
+
+# Failover: extra providers tried in order when LLM_PROVIDER fails or times out.
+# Comma-separated "provider" or "provider:model" entries (model defaults to LLM_MODEL),
+# e.g. groq:llama-3.1-8b-instant,openrouter:meta-llama/llama-3.1-8b-instruct
+# Each provider reads its own settings from LLM_API_KEY_<PROVIDER>, LLM_BASE_URL_<PROVIDER>
+# and LLM_TIMEOUT_<PROVIDER> if set (e.g. LLM_API_KEY_GROQ=..., LLM_TIMEOUT_OLLAMA=8).
+# Leave blank to use LLM_PROVIDER only.
+LLM_PROVIDER_CHAIN=
+
+# Skip a provider for LLM_BREAKER_COOLDOWN_SECONDS after this many failures in a row
+# (0 = never skip)
+LLM_BREAKER_FAILURES=3
+LLM_BREAKER_COOLDOWN_SECONDS=60
+
+# Hedging: if the first provider hasn't answered after LLM_HEDGE_DELAY_MS, also ask the
+# next one in LLM_PROVIDER_CHAIN and use whichever answers first. Not used while streaming.
+ENABLE_LLM_HEDGING=false
+# 0 = automatic: the first provider's recent 90th-percentile reply time
+LLM_HEDGE_DELAY_MS=0
+
+# All LLM requests (mentions, greetings, shitposts...) go through one queue so a burst
+# doesn't hit the model all at once. Direct mentions are served first, then attention
+# window replies, then greetings, then shitposts.
+# Max LLM requests running at the same time
+LLM_MAX_CONCURRENT=2
+# Max requests waiting in the queue; beyond this the least important waiting request
+# is dropped and answered like a failed LLM call (see LLM_FALLBACK_ON_ERROR)
+LLM_QUEUE_MAX=20
+# Max requests one user can have waiting at once (stops one spammer from filling the queue)
+LLM_QUEUE_PER_USER=3
+# Give up waiting in the queue after this many seconds (0 = wait as long as needed)
+LLM_QUEUE_TIMEOUT_SECONDS=30
+
+# Rate limits for LLM replies, checked before any work is done. Each user, channel and
+# server has a bucket that holds up to *_BURST replies and refills at *_PER_MINUTE.
+# When a bucket is empty the bot answers with a random mention message instead.
+# Set *_PER_MINUTE=0 to disable that limit.
+LLM_RATE_USER_BURST=3
+LLM_RATE_USER_PER_MINUTE=6
+LLM_RATE_CHANNEL_BURST=6
+LLM_RATE_CHANNEL_PER_MINUTE=20
+LLM_RATE_GUILD_BURST=15
+LLM_RATE_GUILD_PER_MINUTE=60
+
 # Enable logging of user messages and bot responses to a file
 ENABLE_LOGGING=true
 
@@ -277,6 +449,25 @@ LOG_DIR=logs
 # Log file name
 LOG_FILE=chat.log
 
+# Lowest level written to the log file: DEBUG, INFO, WARNING or ERROR.
+# Messages below this level are skipped before they are even formatted.
+LOG_LEVEL=DEBUG
+
+# Rotate the log file when it reaches this many MB (0 = never rotate)
+LOG_MAX_MB=10
+# Number of rotated log files to keep (chat.log.1, chat.log.2, ...)
+LOG_BACKUP_COUNT=5
+
+# Log lines are written by a background thread so a slow disk never stalls the bot.
+# Max lines waiting to be written; beyond this new lines are dropped (and counted)
+LOG_QUEUE_SIZE=10000
+
+# Structured event log: one JSON object per line (mention received, context
+# fetched, LLM request start/end, reply sent, fallbacks, voice joins) with
+# monotonic timestamps and per-stage durations. Written next to the chat log
+# with the same rotation settings. Summarise it with: python analyze_events.py
+ENABLE_EVENT_LOG=false
+EVENT_LOG_FILE=events.jsonl
 
 
 # --- Heartbeat / Uptime Monitor ---
@@ -288,6 +479,32 @@ HEARTBEAT_INTERVAL_SECONDS=180
 
 
 
+# --- Demotivator ---
+# Posters are rendered in background worker threads so the bot never freezes while drawing.
+# Number of worker threads
+DEMOTIVATOR_WORKERS=2
+
+# Max posters being rendered or waiting at once; extra requests are asked to retry later
+DEMOTIVATOR_MAX_QUEUE=8
+
+# Max posters a single user can have in progress at the same time
+DEMOTIVATOR_PER_USER_LIMIT=1
+
+# Images whose header declares more pixels than this (width x height) are rejected
+# before they are decoded (protects against decompression bombs)
+DEMOTIVATOR_MAX_PIXELS=40000000
+
+# Output format for posters: png or webp (webp uploads are much smaller)
+DEMOTIVATOR_FORMAT=png
+
+# PNG zlib compression level, 0 (fastest, biggest) to 9 (slowest, smallest)
+DEMOTIVATOR_PNG_COMPRESS_LEVEL=6
+
+# WebP quality, 1-100 (only used when DEMOTIVATOR_FORMAT=webp)
+DEMOTIVATOR_WEBP_QUALITY=90
+
+
+
 # --- Voice Chat ---
 # Enable or disable the voice chat feature entirely
 ENABLE_VOICE=false
@@ -295,6 +512,12 @@ ENABLE_VOICE=false
 # Folder containing sound files (.mp3, .ogg, .wav, .flac) for voice playback
 SOUNDS_FOLDER=sounds
 
+# Index of the sounds folder (size, mtime, duration, loudness, codec). Rescanned in
+# the background on startup and on each join; only new or changed files are probed.
+SOUND_INDEX_FILE=cache/sounds.json
+# Files probed in parallel (ffprobe/ffmpeg, when installed) during a rescan
+SOUND_SCAN_WORKERS=4
+
 # Base interval (seconds) between sound playbacks
 VOICE_SOUND_INTERVAL_BASE=45
 
@@ -307,6 +530,20 @@ ENABLE_VOICE_SOUNDS=true
 # Seconds bot waits alone in voice before auto-disconnecting
 VOICE_ALONE_DISCONNECT_SECONDS=30
 
+# Transcode sounds once, in the background, to loudness-normalised 48 kHz Ogg/Opus
+# and play those files directly - no ffmpeg process or Opus encoding per play.
+# Needs ffmpeg on PATH; sounds that are not transcoded yet play the old way.
+ENABLE_VOICE_OPUS_CACHE=true
+# Where the transcoded files live (relative to bot script)
+VOICE_OPUS_CACHE_DIR=cache/opus
+# Opus bitrate in kbit/s (Discord voice channels default to 64)
+VOICE_OPUS_BITRATE=96
+# Integrated loudness target in LUFS (ffmpeg loudnorm); 0 = no normalisation
+VOICE_LOUDNORM_TARGET=-16
+# Keep the Opus frames of the most-played cached sounds in memory (MB, 0 = off)
+# so they start instantly with no disk read
+VOICE_FRAME_CACHE_MB=32
+
 
 
 # --- Voice: Random (Spontaneous) Joins ---
@@ -329,6 +566,21 @@ VOICE_SPONTANEOUS_MAX_STAY=300
 """
 
 
+# Default base URL per LLM provider (used when no base URL is configured)
+LLM_PROVIDER_DEFAULT_URLS = {
+    "ollama":        "http://localhost:11434",
+    "ollama_cloud":  "https://ollama.com",
+    "lmstudio":      "http://localhost:1234",
+    "openai":        "https://api.openai.com",
+    "anthropic":     "https://api.anthropic.com",
+    "groq":          "https://api.groq.com/openai",
+    "openrouter":    "https://openrouter.ai/api",
+    "gemini":        "https://generativelanguage.googleapis.com",
+    "openai_compat": "http://localhost:8080",
+    "openmodel":     "https://api.openmodel.ai",
+}
+
+
 def create_config_template():
     with open(CONFIG_FILE, "w", encoding="utf-8") as f:
         f.write(CONFIG_TEMPLATE)
@@ -347,24 +599,40 @@ def load_config() -> dict:
         "CHICKEN_OUT_CHANNEL_ID", "HONEYPOT_CHANNEL_ID", "SUGGESTION_PING_ROLE_ID", "AUTHORIZED_USER_ID",
         "RANDOM_MESSAGE_CHANCE", "CHICKEN_OUT_TIMEOUT", "LLM_MAX_TOKENS", "LLM_TIMEOUT",
         "LLM_PERCENTAGE_VALUE", "LLM_MEMORY_SIZE", "LLM_CONTEXT_MESSAGES",
+        "LLM_CONTEXT_TOKENS", "LLM_CONTEXT_MESSAGE_MAX_TOKENS",
+        "LLM_SUMMARY_INTERVAL_MINUTES", "LLM_SUMMARY_MIN_NEW_MESSAGES", "LLM_SUMMARY_TAIL_MESSAGES",
+        "HOT_RELOAD_POLL_SECONDS", "LOG_MAX_MB", "LOG_BACKUP_COUNT", "LOG_QUEUE_SIZE",
         "SHITPOST_CHANNEL_ID", "SHITPOST_INTERVAL_MINUTES", "GUILD_ID",
         "BIRTHDAY_CHANNEL_ID", "BIRTHDAY_CHECK_HOUR", "ATTENTION_WINDOW_SECONDS",
-        "LLM_DEBOUNCE_SECONDS", "LLM_VISION_MAX_MB",
+        "LLM_DEBOUNCE_SECONDS", "LLM_VISION_MAX_MB", "LLM_VISION_CONCURRENCY",
+        "LLM_VISION_MAX_EDGE", "LLM_VISION_QUALITY",
+        "LLM_STREAM_EDIT_INTERVAL_MS", "LLM_HISTORY_CACHE_SIZE", "LLM_HISTORY_CACHE_CHANNELS",
+        "LLM_HTTP_MAX_CONNECTIONS_PER_HOST", "LLM_HTTP_KEEPALIVE_SECONDS", "LLM_HTTP_DNS_CACHE_SECONDS",
+        "LLM_CACHE_TTL_SECONDS", "LLM_CACHE_MAX_ENTRIES", "LLM_CACHE_CONTEXT_MESSAGES",
+        "LLM_BREAKER_FAILURES", "LLM_BREAKER_COOLDOWN_SECONDS", "LLM_HEDGE_DELAY_MS",
+        "LLM_MAX_CONCURRENT", "LLM_QUEUE_MAX", "LLM_QUEUE_PER_USER", "LLM_QUEUE_TIMEOUT_SECONDS",
+        "LLM_RATE_USER_BURST", "LLM_RATE_USER_PER_MINUTE", "LLM_RATE_CHANNEL_BURST",
+        "LLM_RATE_CHANNEL_PER_MINUTE", "LLM_RATE_GUILD_BURST", "LLM_RATE_GUILD_PER_MINUTE",
         "VOICE_SOUND_INTERVAL_BASE", "VOICE_SOUND_INTERVAL_VARIANCE",
-        "VOICE_ALONE_DISCONNECT_SECONDS",
+        "VOICE_ALONE_DISCONNECT_SECONDS", "VOICE_OPUS_BITRATE", "VOICE_LOUDNORM_TARGET",
+        "VOICE_FRAME_CACHE_MB", "SOUND_SCAN_WORKERS",
         "VOICE_SPONTANEOUS_CHECK_INTERVAL", "VOICE_SPONTANEOUS_JOIN_CHANCE",
         "VOICE_SPONTANEOUS_MIN_STAY", "VOICE_SPONTANEOUS_MAX_STAY",
         "HEARTBEAT_INTERVAL_SECONDS",
         "GREETING_CHANNEL_ID",
+        "DEMOTIVATOR_WORKERS", "DEMOTIVATOR_MAX_QUEUE", "DEMOTIVATOR_PER_USER_LIMIT",
+        "DEMOTIVATOR_MAX_PIXELS", "DEMOTIVATOR_PNG_COMPRESS_LEVEL", "DEMOTIVATOR_WEBP_QUALITY",
     }
     boolean_keys = {
         "ENABLE_RANDOM_MESSAGES", "ENABLE_MENTION_RESPONSES", "ENABLE_AUTO_THREAD",
         "ENABLE_CHICKEN_OUT", "ENABLE_HONEYPOT", "ENABLE_SUGGESTIONS", "ENABLE_RAPE_COMMAND",
         "ENABLE_LLM", "LLM_FALLBACK_ON_ERROR", "LLM_TYPING_INDICATOR",
         "LLM_PERCENTAGE", "ENABLE_LOGGING", "ENABLE_SHITPOST", "ENABLE_BIRTHDAYS",
-        "ENABLE_ATTENTION_WINDOW", "ENABLE_LLM_VISION",
+        "ENABLE_ATTENTION_WINDOW", "ENABLE_LLM_VISION", "ENABLE_LLM_VISION_RESIZE", "LLM_STREAMING",
+        "ENABLE_LLM_CACHE", "ENABLE_LLM_HEDGING", "LLM_STABLE_PROMPT_PREFIX", "ENABLE_LLM_SUMMARY",
         "ENABLE_VOICE", "ENABLE_VOICE_SOUNDS", "ENABLE_VOICE_SPONTANEOUS", "ENABLE_REPLY_TO_MESSAGE",
-        "ENABLE_GREETING",
+        "ENABLE_GREETING", "ENABLE_HOT_RELOAD", "ENABLE_EVENT_LOG",
+        "ENABLE_VOICE_OPUS_CACHE",
     }
 
     with open(CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -383,6 +651,13 @@ def load_config() -> dict:
                     exit(1)
             elif key in boolean_keys:
                 config[key] = value.lower() in ("true", "1", "yes", "on")
+            elif key.startswith("LLM_TIMEOUT_"):
+                # Per-provider timeout override, e.g. LLM_TIMEOUT_GROQ=10
+                try:
+                    config[key] = int(value) if value else 0
+                except ValueError:
+                    print(f"❌ {key} must be a number, got '{value}'. Fix {CONFIG_FILE}.")
+                    exit(1)
             else:
                 config[key] = value
 
@@ -404,6 +679,9 @@ def load_config() -> dict:
     # Defaults for optional fields
     config.setdefault("COMMAND_PREFIX", "/")
     config.setdefault("COMMANDS_FOLDER", "commands")
+    config.setdefault("COMMAND_ALIASES", "list:help,chunk_generation:chunk_lag")
+    config.setdefault("ENABLE_HOT_RELOAD", True)
+    config.setdefault("HOT_RELOAD_POLL_SECONDS", 2)
     config.setdefault("GUILD_ID", 0)
     config.setdefault("CHICKEN_OUT_TIMEOUT", 900)
     config.setdefault("CHICKENED_OUT_MSG", "https://tenor.com/view/walk-away-gif-8390063")
@@ -417,37 +695,72 @@ def load_config() -> dict:
     config.setdefault("LLM_PROVIDER", "ollama")
     config.setdefault("LLM_API_KEY", "")
     # Resolve default base URL per provider if not set
-    provider_defaults = {
-        "ollama":        "http://localhost:11434",
-        "ollama_cloud":  "https://ollama.com",
-        "lmstudio":      "http://localhost:1234",
-        "openai":        "https://api.openai.com",
-        "anthropic":     "https://api.anthropic.com",
-        "groq":          "https://api.groq.com/openai",
-        "openrouter":    "https://openrouter.ai/api",
-        "gemini":        "https://generativelanguage.googleapis.com",
-        "openai_compat": "http://localhost:8080",
-        "openmodel":     "https://api.openmodel.ai",
-    }
     provider = config.get("LLM_PROVIDER", "ollama").lower()
     if not config.get("LLM_BASE_URL"):
-        config["LLM_BASE_URL"] = provider_defaults.get(provider, "http://localhost:11434")
+        config["LLM_BASE_URL"] = LLM_PROVIDER_DEFAULT_URLS.get(provider, "http://localhost:11434")
     config.setdefault("LLM_MODEL", "mistral")
     config.setdefault("LLM_SYSTEM_PROMPT", "You are Bruh - a sarcastic Discord bot. Speak ONLY as yourself. Never write lines for other users. Never simulate conversations. Raw answer only. 1-3 sentences max.")
     config.setdefault("LLM_MAX_TOKENS", 200)
     config.setdefault("LLM_TIMEOUT", 30)
     config.setdefault("LLM_FALLBACK_ON_ERROR", True)
     config.setdefault("LLM_TYPING_INDICATOR", True)
+    config.setdefault("LLM_STREAMING", False)
+    config.setdefault("LLM_STREAM_EDIT_INTERVAL_MS", 1500)
+    config.setdefault("LLM_STABLE_PROMPT_PREFIX", False)
+    config.setdefault("LLM_OLLAMA_KEEP_ALIVE", "")
     config.setdefault("LLM_FALLBACK_MSG", "")
     config.setdefault("LLM_PERCENTAGE", False)
     config.setdefault("LLM_PERCENTAGE_VALUE", 75)
     config.setdefault("LLM_MEMORY_SIZE", 10)
     config.setdefault("LLM_CONTEXT_MESSAGES", 20)
+    config.setdefault("LLM_CONTEXT_TOKENS", 3000)
+    config.setdefault("LLM_CONTEXT_TOKEN_BUDGETS", "")
+    config.setdefault("LLM_CONTEXT_MESSAGE_MAX_TOKENS", 300)
+    config.setdefault("ENABLE_LLM_SUMMARY", False)
+    config.setdefault("LLM_SUMMARY_INTERVAL_MINUTES", 10)
+    config.setdefault("LLM_SUMMARY_MIN_NEW_MESSAGES", 10)
+    config.setdefault("LLM_SUMMARY_TAIL_MESSAGES", 8)
+    config.setdefault("LLM_SUMMARY_FILE", "channel_summaries.json")
+    config.setdefault("LLM_HISTORY_CACHE_SIZE", 50)
+    config.setdefault("LLM_HISTORY_CACHE_CHANNELS", 200)
     config.setdefault("ENABLE_LLM_VISION", False)
     config.setdefault("LLM_VISION_MAX_MB", 10)
+    config.setdefault("LLM_VISION_CONCURRENCY", 4)
+    config.setdefault("ENABLE_LLM_VISION_RESIZE", True)
+    config.setdefault("LLM_VISION_MAX_EDGE", 1568)
+    config.setdefault("LLM_VISION_FORMAT", "jpeg")
+    config.setdefault("LLM_VISION_QUALITY", 85)
+    config.setdefault("LLM_HTTP_MAX_CONNECTIONS_PER_HOST", 8)
+    config.setdefault("LLM_HTTP_KEEPALIVE_SECONDS", 60)
+    config.setdefault("LLM_HTTP_DNS_CACHE_SECONDS", 300)
+    config.setdefault("ENABLE_LLM_CACHE", False)
+    config.setdefault("LLM_CACHE_TTL_SECONDS", 300)
+    config.setdefault("LLM_CACHE_MAX_ENTRIES", 256)
+    config.setdefault("LLM_CACHE_CONTEXT_MESSAGES", 2)
+    config.setdefault("LLM_PROVIDER_CHAIN", "")
+    config.setdefault("LLM_BREAKER_FAILURES", 3)
+    config.setdefault("LLM_BREAKER_COOLDOWN_SECONDS", 60)
+    config.setdefault("ENABLE_LLM_HEDGING", False)
+    config.setdefault("LLM_HEDGE_DELAY_MS", 0)
+    config.setdefault("LLM_MAX_CONCURRENT", 2)
+    config.setdefault("LLM_QUEUE_MAX", 20)
+    config.setdefault("LLM_QUEUE_PER_USER", 3)
+    config.setdefault("LLM_QUEUE_TIMEOUT_SECONDS", 30)
+    config.setdefault("LLM_RATE_USER_BURST", 3)
+    config.setdefault("LLM_RATE_USER_PER_MINUTE", 6)
+    config.setdefault("LLM_RATE_CHANNEL_BURST", 6)
+    config.setdefault("LLM_RATE_CHANNEL_PER_MINUTE", 20)
+    config.setdefault("LLM_RATE_GUILD_BURST", 15)
+    config.setdefault("LLM_RATE_GUILD_PER_MINUTE", 60)
     config.setdefault("ENABLE_LOGGING", True)
     config.setdefault("LOG_DIR", "logs")
     config.setdefault("LOG_FILE", "chat.log")
+    config.setdefault("LOG_LEVEL", "DEBUG")
+    config.setdefault("LOG_MAX_MB", 10)
+    config.setdefault("LOG_BACKUP_COUNT", 5)
+    config.setdefault("LOG_QUEUE_SIZE", 10000)
+    config.setdefault("ENABLE_EVENT_LOG", False)
+    config.setdefault("EVENT_LOG_FILE", "events.jsonl")
     config.setdefault("ENABLE_SHITPOST", False)
     config.setdefault("SHITPOST_CHANNEL_ID", 0)
     config.setdefault("SHITPOST_INTERVAL_MINUTES", 60)
@@ -478,16 +791,32 @@ def load_config() -> dict:
     config.setdefault("HEARTBEAT_URL", "")
     config.setdefault("HEARTBEAT_INTERVAL_SECONDS", 180)
 
+    # Demotivator defaults
+    config.setdefault("DEMOTIVATOR_WORKERS", 2)
+    config.setdefault("DEMOTIVATOR_MAX_QUEUE", 8)
+    config.setdefault("DEMOTIVATOR_PER_USER_LIMIT", 1)
+    config.setdefault("DEMOTIVATOR_MAX_PIXELS", 40_000_000)
+    config.setdefault("DEMOTIVATOR_FORMAT", "png")
+    config.setdefault("DEMOTIVATOR_PNG_COMPRESS_LEVEL", 6)
+    config.setdefault("DEMOTIVATOR_WEBP_QUALITY", 90)
+
     # Voice chat defaults
     config.setdefault("ENABLE_REPLY_TO_MESSAGE", True)
     config.setdefault("ENABLE_HONEYPOT", False)
     config.setdefault("HONEYPOT_CHANNEL_ID", 0)
     config.setdefault("ENABLE_VOICE", False)
     config.setdefault("SOUNDS_FOLDER", "sounds")
+    config.setdefault("SOUND_INDEX_FILE", "cache/sounds.json")
+    config.setdefault("SOUND_SCAN_WORKERS", 4)
     config.setdefault("VOICE_SOUND_INTERVAL_BASE", 45)
     config.setdefault("VOICE_SOUND_INTERVAL_VARIANCE", 20)
     config.setdefault("ENABLE_VOICE_SOUNDS", True)
     config.setdefault("VOICE_ALONE_DISCONNECT_SECONDS", 30)
+    config.setdefault("ENABLE_VOICE_OPUS_CACHE", True)
+    config.setdefault("VOICE_OPUS_CACHE_DIR", "cache/opus")
+    config.setdefault("VOICE_OPUS_BITRATE", 96)
+    config.setdefault("VOICE_LOUDNORM_TARGET", -16)
+    config.setdefault("VOICE_FRAME_CACHE_MB", 32)
     config.setdefault("ENABLE_VOICE_SPONTANEOUS", True)
     config.setdefault("VOICE_SPONTANEOUS_CHECK_INTERVAL", 300)
     config.setdefault("VOICE_SPONTANEOUS_JOIN_CHANCE", 25)
@@ -514,10 +843,11 @@ def load_system_prompt() -> str:
         if text:
             print(f"✅ Loaded system prompt from {PROMPT_FILE} ({len(text)} chars)")
             return text
-    return cfg.get("LLM_SYSTEM_PROMPT", "")
+    return _CONFIG_SYSTEM_PROMPT
 
 
 cfg = load_config()
+_CONFIG_SYSTEM_PROMPT = cfg.get("LLM_SYSTEM_PROMPT", "")   # fallback if PROMPT.txt is missing or emptied
 cfg["LLM_SYSTEM_PROMPT"] = load_system_prompt()
 
 # Guild object used for guild-specific command registration (instant sync).
@@ -528,15 +858,57 @@ _GUILD: discord.Object | None = discord.Object(id=cfg["GUILD_ID"]) if cfg.get("G
 # LOGGING SETUP
 # ============================================================
 
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the writer falls behind."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0          # total since startup
+        self._unreported = 0      # dropped since the last "dropped N" notice
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self._unreported:
+                notice = logging.makeLogRecord({
+                    "name": record.name, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"[LOG] Dropped {self._unreported} log line(s) - log writer overloaded",
+                })
+                self.queue.put_nowait(notice)
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+def _log_file_handler(path: pathlib.Path) -> logging.Handler:
+    """File handler for *path*, rotating per LOG_MAX_MB / LOG_BACKUP_COUNT."""
+    if cfg["LOG_MAX_MB"] > 0:
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=cfg["LOG_MAX_MB"] * 1024 * 1024,
+            backupCount=max(0, cfg["LOG_BACKUP_COUNT"]), encoding="utf-8",
+        )
+    return logging.FileHandler(path, encoding="utf-8")
+
+
 def setup_logger() -> logging.Logger:
-    """Create a file+console logger for chat activity."""
+    """Create a file+console logger for chat activity.
+
+    Records go through a bounded queue to a QueueListener thread that owns the
+    (rotating) file handler and the console handler, so log() never touches disk.
+    """
     log_dir = BOT_DIR / cfg["LOG_DIR"]
     log_dir.mkdir(exist_ok=True)
 
     log_path = log_dir / cfg["LOG_FILE"]
 
     logger = logging.getLogger("bruh_bot")
-    logger.setLevel(logging.DEBUG)
+    level = logging.getLevelName(str(cfg["LOG_LEVEL"]).upper())
+    if not isinstance(level, int):
+        print(f"⚠️  Unknown LOG_LEVEL '{cfg['LOG_LEVEL']}', using DEBUG.")
+        level = logging.DEBUG
+    logger.setLevel(level)
+    logger.propagate = False
 
     if logger.handlers:
         return logger
@@ -546,15 +918,20 @@ def setup_logger() -> logging.Logger:
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
-    fh = logging.FileHandler(log_path, encoding="utf-8")
+    fh = _log_file_handler(log_path)
     fh.setLevel(logging.DEBUG)
     fh.setFormatter(fmt)
-    logger.addHandler(fh)
 
     ch = logging.StreamHandler()
     ch.setLevel(logging.INFO)
     ch.setFormatter(fmt)
-    logger.addHandler(ch)
+
+    qh = _BoundedQueueHandler(queue.Queue(maxsize=max(1, cfg["LOG_QUEUE_SIZE"])))
+    logger.addHandler(qh)
+
+    listener = logging.handlers.QueueListener(qh.queue, fh, ch, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)   # flush what's still queued on shutdown
 
     print(f"📝 Logging to {log_path}")
     return logger
@@ -562,40 +939,332 @@ def setup_logger() -> logging.Logger:
 
 chat_log = setup_logger() if cfg["ENABLE_LOGGING"] else None
 
+_LOG_LEVELS = {
+    "debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING,
+    "error": logging.ERROR, "critical": logging.CRITICAL,
+}
+
 
-def log(level: str, text: str):
-    """Convenience wrapper - no-ops if logging is disabled."""
+def log(level: str, text: str, *args):
+    """Convenience wrapper - no-ops if logging is disabled.
+
+    Pass values as %-style *args* instead of an f-string on hot paths: they are
+    only formatted if *level* is enabled.
+    """
     if chat_log is None:
         return
-    getattr(chat_log, level, chat_log.info)(text)
+    levelno = _LOG_LEVELS.get(level, logging.INFO)
+    if chat_log.isEnabledFor(levelno):
+        chat_log.log(levelno, text, *args)
+
+
+# ------------------------------------------------------------
+# Structured event log
+# ------------------------------------------------------------
+
+# Id of the request being traced (the triggering message id). Set once per
+# mention; tasks created from there inherit it, so LLM events can be joined
+# back to the mention they belong to.
+_event_trace: contextvars.ContextVar[int | None] = contextvars.ContextVar("event_trace", default=None)
+
+
+def setup_event_log() -> logging.Logger:
+    """JSON-lines sink for event(), written by its own queue listener thread."""
+    log_dir = BOT_DIR / cfg["LOG_DIR"]
+    log_dir.mkdir(exist_ok=True)
+    path = log_dir / cfg["EVENT_LOG_FILE"]
+
+    logger = logging.getLogger("bruh_bot.events")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if logger.handlers:
+        return logger
+
+    fh = _log_file_handler(path)
+    fh.setFormatter(logging.Formatter("%(message)s"))
+
+    qh = _BoundedQueueHandler(queue.Queue(maxsize=max(1, cfg["LOG_QUEUE_SIZE"])))
+    logger.addHandler(qh)
+
+    listener = logging.handlers.QueueListener(qh.queue, fh)
+    listener.start()
+    atexit.register(listener.stop)
+
+    print(f"📊 Event log: {path}")
+    return logger
+
+
+event_log = setup_event_log() if cfg["ENABLE_EVENT_LOG"] else None
+
+
+def event(name: str, **fields):
+    """Record one structured event - no-ops if the event log is disabled.
+
+    Every line carries the wall-clock time (ts), a monotonic clock reading
+    (mono, for ordering and gaps) and the current trace id. Stages report
+    their duration as dur_ms; see analyze_events.py.
+    """
+    if event_log is None:
+        return
+    record = {"ts": round(time.time(), 3), "mono": round(time.monotonic(), 4), "event": name}
+    trace = _event_trace.get()
+    if trace is not None:
+        record["trace"] = trace
+    record.update(fields)
+    event_log.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def ms_since(started: float) -> float:
+    """Milliseconds elapsed since the time.monotonic() reading *started*."""
+    return round((time.monotonic() - started) * 1000, 1)
 
 
 # ============================================================
 # CONVERSATION MEMORY  (Discord channel history = our memory)
 # ============================================================
 
+_MENTION_RE = re.compile(r"<@!?(\d+)>")
+
+# guild_id → LRU of user_id → display name, used when resolving <@id> mentions.
+# Entries are dropped by on_member_update / on_user_update when a name changes.
+_DISPLAY_NAME_CACHE_SIZE = 512
+_display_names: dict[int, OrderedDict[int, str]] = {}
+
+# message_id → (edited_at, resolved content). Lets fetch_channel_context resolve
+# only messages it hasn't seen before instead of the whole window on every reply.
+_RESOLVED_CONTENT_CACHE_SIZE = 2048
+_resolved_content: OrderedDict[int, tuple[datetime | None, str]] = OrderedDict()
+
+
+def member_display_name(member: discord.abc.User) -> str:
+    """Server nick, then global name, then display name, then username."""
+    return (
+        getattr(member, "nick", None)
+        or getattr(member, "global_name", None)
+        or member.display_name
+        or member.name
+    )
+
+
+def _cached_display_name(guild: discord.Guild, uid: int) -> str | None:
+    names = _display_names.setdefault(guild.id, OrderedDict())
+    name = names.get(uid)
+    if name is not None:
+        names.move_to_end(uid)
+        return name
+    member = guild.get_member(uid)
+    if member is None:
+        return None  # not cached, so a later join still resolves
+    name = names[uid] = member_display_name(member)
+    if len(names) > _DISPLAY_NAME_CACHE_SIZE:
+        names.popitem(last=False)
+    return name
+
+
+def _mention_replacement(guild: discord.Guild, match: re.Match) -> str:
+    name = _cached_display_name(guild, int(match.group(1)))
+    return f"<{name}>" if name else match.group(0)  # Leave as-is if member not found
+
+
 def resolve_mentions(content: str, guild: discord.Guild | None) -> str:
     """Replace raw <@user_id> mentions with readable display names.
 
     e.g. "<@123456789>" -> "<Bufka2011>"
     """
-    if guild is None:
+    if guild is None or "<@" not in content:
         return content
+    return _MENTION_RE.sub(functools.partial(_mention_replacement, guild), content)
+
+
+def resolve_message_content(message: discord.Message, guild: discord.Guild | None) -> str:
+    """resolve_mentions() for a whole message, memoised by message id and edit time."""
+    cached = _resolved_content.get(message.id)
+    if cached is not None and cached[0] == message.edited_at:
+        _resolved_content.move_to_end(message.id)
+        return cached[1]
+    content = resolve_mentions(message.content, guild)
+    _resolved_content[message.id] = (message.edited_at, content)
+    if len(_resolved_content) > _RESOLVED_CONTENT_CACHE_SIZE:
+        _resolved_content.popitem(last=False)
+    return content
+
+
+def invalidate_display_name(user_id: int, guild_id: int | None = None):
+    """Forget a user's cached display name (in one guild, or everywhere)."""
+    caches = [_display_names.get(guild_id)] if guild_id is not None else _display_names.values()
+    for names in caches:
+        if names is not None:
+            names.pop(user_id, None)
+    # Memoised message text may embed the old name.
+    _resolved_content.clear()
+
+
+class ChannelHistoryCache:
+    """Bounded in-memory buffer of recent messages per channel.
+
+    Fed by on_message (including the bot's own sends), on_message_edit and
+    on_raw_message_delete. A channel is backfilled over REST the first time
+    it is read after startup; after that reads never touch the API.
+    """
+
+    def __init__(self, size: int, max_channels: int):
+        self.size = max(1, size)
+        self.max_channels = max(1, max_channels)
+        self._channels: OrderedDict[int, deque[discord.Message]] = OrderedDict()
+        self._backfilled: set[int] = set()
+        self._from_start: set[int] = set()   # backfill found the channel's first message
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def _buffer(self, channel_id: int) -> deque[discord.Message]:
+        buf = self._channels.get(channel_id)
+        if buf is None:
+            buf = self._channels[channel_id] = deque(maxlen=self.size)
+            while len(self._channels) > self.max_channels:
+                evicted, _ = self._channels.popitem(last=False)
+                self._backfilled.discard(evicted)
+                self._from_start.discard(evicted)
+                self._locks.pop(evicted, None)
+        else:
+            self._channels.move_to_end(channel_id)
+        return buf
+
+    def add(self, message: discord.Message):
+        self._buffer(message.channel.id).append(message)
+
+    def update(self, message: discord.Message):
+        buf = self._channels.get(message.channel.id)
+        if not buf:
+            return
+        for i in range(len(buf) - 1, -1, -1):
+            if buf[i].id == message.id:
+                buf[i] = message
+                return
+
+    def remove(self, channel_id: int, message_ids: set[int]):
+        buf = self._channels.get(channel_id)
+        if not buf:
+            return
+        kept = [m for m in buf if m.id not in message_ids]
+        if len(kept) != len(buf):
+            buf.clear()
+            buf.extend(kept)
+
+    async def _backfill(self, channel: discord.abc.Messageable):
+        lock = self._locks.setdefault(channel.id, asyncio.Lock())
+        async with lock:
+            if channel.id in self._backfilled:
+                return
+            try:
+                fetched = [m async for m in channel.history(limit=self.size)]
+            except discord.HTTPException as e:
+                log("warning", f"[HISTORY] Backfill failed for channel {channel.id}: {e}")
+                fetched = []
+            buf = self._buffer(channel.id)
+            merged = {m.id: m for m in fetched}
+            merged.update((m.id, m) for m in buf)  # live copies win over fetched ones
+            buf.clear()
+            buf.extend(sorted(merged.values(), key=lambda m: m.id)[-self.size:])
+            self._backfilled.add(channel.id)
+            if len(fetched) < self.size:
+                self._from_start.add(channel.id)
+            log("debug", "[HISTORY] Backfilled channel %s with %d message(s)", channel.id, len(fetched))
+
+    async def get(
+        self,
+        channel: discord.abc.Messageable,
+        before: discord.Message | None,
+        limit: int,
+    ) -> list[discord.Message]:
+        """Return up to *limit* most recent messages older than *before* (oldest first)."""
+        if channel.id not in self._backfilled:
+            await self._backfill(channel)
+        buf = self._buffer(channel.id)
+        older = [m for m in buf if before is None or m.id < before.id][-limit:]
+
+        # The buffer holds the whole channel only until it first fills up.
+        reaches_start = channel.id in self._from_start and len(buf) < self.size
+        if len(older) < limit and not reaches_start:
+            # Not enough buffered before *before* - fetch the rest over the API.
+            log("debug", "[HISTORY] Cache miss in channel %s, fetching over REST", channel.id)
+            anchor = older[0] if older else before
+            try:
+                fetched = [m async for m in channel.history(limit=limit - len(older), before=anchor)]
+            except discord.HTTPException as e:
+                log("warning", f"[HISTORY] Fetch failed for channel {channel.id}: {e}")
+                fetched = []
+            fetched.reverse()
+            older = fetched + older
+        return older
+
+    def buffered(self, channel_id: int) -> list[discord.Message]:
+        """Messages currently held for *channel_id*, oldest first (never hits the API)."""
+        return list(self._channels.get(channel_id, ()))
+
+    def count_newer(self, channel_id: int, message_id: int) -> int:
+        """How many buffered messages in *channel_id* are newer than *message_id*."""
+        count = 0
+        for m in reversed(self._channels.get(channel_id, ())):
+            if m.id <= message_id:
+                break
+            count += 1
+        return count
+
+    def channel_ids(self) -> list[int]:
+        """Buffered channels, most recently active first."""
+        return list(reversed(self._channels))
+
+
+history_cache = ChannelHistoryCache(
+    size=max(cfg["LLM_HISTORY_CACHE_SIZE"], cfg["LLM_CONTEXT_MESSAGES"]),
+    max_channels=cfg["LLM_HISTORY_CACHE_CHANNELS"],
+)
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (~4 UTF-8 bytes per token) - close enough for budgeting."""
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut *text* to roughly *max_tokens* tokens (0 = no limit)."""
+    if max_tokens <= 0 or approx_tokens(text) <= max_tokens:
+        return text
+    cut = text.encode("utf-8")[: max_tokens * 4].decode("utf-8", errors="ignore")
+    return cut.rstrip() + " […]"
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_token_budgets(spec: str) -> dict[str, int]:
+    budgets = {}
+    for entry in spec.split(","):
+        key, _, value = entry.rpartition("=")
+        key = key.strip().lower()
+        if key and value.strip().isdigit():
+            budgets[key] = int(value)
+        elif entry.strip():
+            print(f"⚠️  Ignoring bad LLM_CONTEXT_TOKEN_BUDGETS entry: {entry.strip()!r}")
+    return budgets
 
-    def _replace(match: re.Match) -> str:
-        uid = int(match.group(1))
-        member = guild.get_member(uid)
-        if member:
-            name = (
-                getattr(member, "nick", None)
-                or getattr(member, "global_name", None)
-                or member.display_name
-                or member.name
-            )
-            return f"<{name}>"
-        return match.group(0)  # Leave as-is if member not found
 
-    return re.sub(r"<@!?(\d+)>", _replace, content)
+def context_token_budget(provider: str, model: str) -> int:
+    """Prompt token budget for *provider*/*model* (0 = unlimited)."""
+    budgets = _parse_token_budgets(cfg.get("LLM_CONTEXT_TOKEN_BUDGETS", ""))
+    provider = provider.lower()
+    return budgets.get(f"{provider}:{model.lower()}", budgets.get(provider, cfg.get("LLM_CONTEXT_TOKENS", 0)))
+
+
+def fit_history_to_budget(history: list[dict], budget: int) -> list[dict]:
+    """Drop the oldest history entries until their estimated size fits in *budget* tokens."""
+    kept, used = [], 0
+    for entry in reversed(history):
+        used += approx_tokens(entry["content"])
+        if used > budget:
+            break
+        kept.append(entry)
+    if len(kept) < len(history):
+        log("debug", "[CONTEXT] Trimmed %d old message(s) to fit %d tokens", len(history) - len(kept), budget)
+    kept.reverse()
+    return kept
 
 
 async def fetch_channel_context(
@@ -608,45 +1277,96 @@ async def fetch_channel_context(
     if limit <= 0:
         return []
 
-    raw: list[discord.Message] = []
-    kwargs = {"limit": limit}
-    if current_message is not None:
-        kwargs["before"] = current_message
-    async for msg in channel.history(**kwargs):
-        if msg.content:
-            raw.append(msg)
-
-    raw.reverse()
+    raw = [msg for msg in await history_cache.get(channel, current_message, limit) if msg.content]
+    max_tokens = cfg.get("LLM_CONTEXT_MESSAGE_MAX_TOKENS", 0)
 
     history: list[dict] = []
+    last_author = None
     for msg in raw:
         # Resolve @mentions to names
-        content = resolve_mentions(msg.content, guild)
+        content = truncate_to_tokens(resolve_message_content(msg, guild), max_tokens)
+
+        # Consecutive messages from one author become a single entry
+        if msg.author.id == last_author:
+            history[-1]["content"] += f"\n{content}"
+            continue
+        last_author = msg.author.id
 
         if msg.author == bot_user:
             history.append({"role": "assistant", "content": content})
         else:
-            name = (
-                getattr(msg.author, "nick", None)
-                or getattr(msg.author, "global_name", None)
-                or msg.author.display_name
-                or msg.author.name
-            )
+            name = member_display_name(msg.author)
             history.append({"role": "user", "content": f"[{name}]: {content}"})
 
     return history
 
 
+# ============================================================
+# FILE HELPERS
+# ============================================================
+
+@contextlib.contextmanager
+def locked_file(path: pathlib.Path):
+    """Hold an exclusive lock on *path* (via a sidecar .lock file) for the duration of the block.
+
+    The sidecar is used because atomic rewrites replace the file itself.
+    Without fcntl (Windows) this is a no-op.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + ".lock"), "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_text(path: pathlib.Path, text: str):
+    """Replace *path* with *text* via a temp file + rename, so a crash never leaves it half-written."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def append_line(path: pathlib.Path, line: str):
+    """Append *line* to *path*, adding the missing newline first if the file doesn't end in one."""
+    with open(path, "ab+") as f:
+        f.seek(0, os.SEEK_END)
+        prefix = b""
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                prefix = b"\n"
+        f.write(prefix + line.encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
 # ============================================================
 # MESSAGE LISTS
 # ============================================================
 
 class MessageLists:
-    """Loads and manages the default and mention message lists."""
+    """Loads and manages the default and mention message lists.
+
+    Each list has a set alongside it for O(1) duplicate checks; additions are
+    appended to the file under a lock instead of rewriting it.
+    """
 
     def __init__(self):
         self.default: list[str] = []
         self.mention: list[str] = []
+        self._index: dict[str, set[str]] = {"default": set(), "mention": set()}
         self.load()
 
     def _read_file(self, filename: str) -> list[str]:
@@ -659,27 +1379,116 @@ class MessageLists:
         print(f"✅ Loaded {len(lines)} messages from {path.name}")
         return lines
 
-    def _write_file(self, filename: str, messages: list[str]):
-        path = BOT_DIR / filename
-        path.write_text("\n".join(messages) + "\n", encoding="utf-8")
-
     def load(self):
         self.default = self._read_file(cfg["DEFAULT_MSGS_FILE"])
         self.mention = self._read_file(cfg["MENTION_MSGS_FILE"])
+        self._index = {"default": set(self.default), "mention": set(self.mention)}
+
+    async def reload(self, list_type: str):
+        """Re-read one list off the event loop and swap it in."""
+        filename = cfg["DEFAULT_MSGS_FILE"] if list_type == "default" else cfg["MENTION_MSGS_FILE"]
+        lines = await asyncio.to_thread(self._read_file, filename)
+        if list_type == "default":
+            self.default = lines
+        else:
+            self.mention = lines
+        self._index[list_type] = set(lines)
+
+    @staticmethod
+    def _append(path: pathlib.Path, message: str):
+        with locked_file(path):
+            append_line(path, message)
 
-    def add(self, message: str, list_type: str) -> bool:
+    async def add(self, message: str, list_type: str) -> bool:
+        list_type = "default" if list_type == "default" else "mention"
         target = self.default if list_type == "default" else self.mention
         filename = cfg["DEFAULT_MSGS_FILE"] if list_type == "default" else cfg["MENTION_MSGS_FILE"]
-        if message in target:
+        message = message.strip()
+        index = self._index[list_type]
+        if message in index:
             return False
+        # Claim the line before awaiting so a concurrent add can't append it twice.
+        index.add(message)
+        try:
+            await asyncio.to_thread(self._append, BOT_DIR / filename, message)
+        except BaseException:
+            index.discard(message)
+            raise
         target.append(message)
-        self._write_file(filename, target)
         return True
 
 
 msgs = MessageLists()
 
 
+# ============================================================
+# PREFIX COMMANDS
+# ============================================================
+
+class PrefixCommands:
+    """Contents of COMMANDS_FOLDER/<name>.txt, held in memory so commands need no disk reads.
+
+    COMMAND_ALIASES maps extra names onto commands; usage is counted per command.
+    """
+
+    def __init__(self):
+        self.folder = BOT_DIR / cfg["COMMANDS_FOLDER"]
+        self._texts: dict[str, str] = {}
+        self.aliases: dict[str, str] = {}
+        for pair in cfg.get("COMMAND_ALIASES", "").split(","):
+            alias, _, target = pair.partition(":")
+            if alias.strip() and target.strip():
+                self.aliases[alias.strip().lower()] = target.strip().lower()
+        self.hits: Counter[str] = Counter()
+        self.load()
+
+    @staticmethod
+    def _read(path: pathlib.Path) -> str | None:
+        try:
+            return path.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def load(self):
+        texts = {}
+        if self.folder.is_dir():
+            for path in sorted(self.folder.glob("*.txt")):
+                text = self._read(path)
+                if text is not None:
+                    texts[path.stem.lower()] = text
+        self._texts = texts
+        print(f"✅ Loaded {len(texts)} prefix commands from {self.folder.name}/")
+
+    async def reload_file(self, path: pathlib.Path):
+        """Re-read one command file off the event loop (or drop it if it was deleted)."""
+        text = await asyncio.to_thread(self._read, path)
+        texts = dict(self._texts)
+        if text is None:
+            texts.pop(path.stem.lower(), None)
+        else:
+            texts[path.stem.lower()] = text
+        self._texts = texts
+
+    def resolve(self, name: str) -> tuple[str, str] | None:
+        """Return (command, text) for *name* or one of its aliases and count the hit.
+
+        The text is "" for an empty file; None means there is no such command.
+        """
+        texts = self._texts
+        if name not in texts:
+            name = self.aliases.get(name, name)
+            if name not in texts:
+                return None
+        self.hits[name] += 1
+        return name, texts[name]
+
+    def names(self) -> list[str]:
+        return sorted(self._texts)
+
+
+prefix_commands = PrefixCommands()
+
+
 # ============================================================
 # BIRTHDAY STORE
 # ============================================================
@@ -693,6 +1502,7 @@ class BirthdayStore:
     def __init__(self):
         self.path = BOT_DIR / cfg["BIRTHDAY_DATA_FILE"]
         self._data: dict[str, dict] = {}
+        self._save_lock = asyncio.Lock()
         self.load()
 
     def load(self):
@@ -705,18 +1515,25 @@ class BirthdayStore:
         else:
             self._data = {}
 
-    def save(self):
-        self.path.write_text(json.dumps(self._data, indent=2), encoding="utf-8")
+    async def save(self):
+        # Serialise on the loop, write in a thread; the lock keeps writes in order.
+        async with self._save_lock:
+            text = json.dumps(self._data, indent=2)
+            await asyncio.to_thread(self._write, text)
 
-    def set(self, user_id: int, month: int, day: int):
+    def _write(self, text: str):
+        with locked_file(self.path):
+            atomic_write_text(self.path, text)
+
+    async def set(self, user_id: int, month: int, day: int):
         self._data[str(user_id)] = {"month": month, "day": day}
-        self.save()
+        await self.save()
 
-    def remove(self, user_id: int) -> bool:
+    async def remove(self, user_id: int) -> bool:
         key = str(user_id)
         if key in self._data:
             del self._data[key]
-            self.save()
+            await self.save()
             return True
         return False
 
@@ -751,112 +1568,648 @@ birthdays = BirthdayStore()
 
 
 # ============================================================
-# VOICE MANAGER
+# CHANNEL SUMMARY STORE
 # ============================================================
 
-class VoiceManager:
-    """Manages all voice channel logic for Bruh Bot.
+class ChannelSummaryStore:
+    """Rolling per-channel conversation summaries persisted in a JSON file.
 
-    Responsibilities:
-      - LLM-based voice invitation detection (no hardcoded phrases)
-      - Joining / leaving voice channels
-      - Periodic random sound playback from the sounds/ folder
-      - Auto-disconnect when the bot is left alone
+    Data format: { "channel_id_str": {"summary": str, "last_message_id": int, "updated": iso} }
+    where last_message_id is the newest message already folded into the summary.
     """
 
-    SOUND_EXTENSIONS = {".mp3", ".ogg", ".wav", ".flac"}
-
     def __init__(self):
-        # guild_id → discord.VoiceClient
-        self._voice_clients: dict[int, discord.VoiceClient] = {}
-        # guild_id → asyncio.Task (sound loop)
-        self._sound_tasks: dict[int, asyncio.Task] = {}
-        # guild_id → asyncio.Task (alone-watcher)
-        self._alone_tasks: dict[int, asyncio.Task] = {}
-        # guild_id → "invited" or "spontaneous"
-        self._join_modes: dict[int, str] = {}
-        # Background task for spontaneous joins
-        self._spontaneous_task: asyncio.Task | None = None
-        # Cached sound file list (refreshed on each join)
-        self._sounds: list[pathlib.Path] = []
-        self._load_sounds()
+        self.path = BOT_DIR / cfg["LLM_SUMMARY_FILE"]
+        self._data: dict[str, dict] = {}
+        self._save_lock = asyncio.Lock()
+        self.load()
 
-    # ------------------------------------------------------------------
-    # Sound file discovery
-    # ------------------------------------------------------------------
+    def load(self):
+        if self.path.exists():
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"⚠️  Could not load channel summaries: {e}")
+                self._data = {}
+        else:
+            self._data = {}
 
-    def _load_sounds(self) -> int:
-        """Scan the configured sounds folder and cache file paths."""
-        folder = BOT_DIR / cfg.get("SOUNDS_FOLDER", "sounds")
-        if not folder.exists():
-            folder.mkdir(parents=True, exist_ok=True)
-            log("info", "[VOICE] Created empty sounds/ folder.")
-            self._sounds = []
-            return 0
+    async def save(self):
+        # Serialise on the loop so the thread never sees _data mid-update; the
+        # lock keeps two folds from landing their writes out of order.
+        async with self._save_lock:
+            text = json.dumps(self._data, indent=2)
+            await asyncio.to_thread(self._write, text)
+
+    def _write(self, text: str):
+        with locked_file(self.path):
+            atomic_write_text(self.path, text)
+
+    def get(self, channel_id: int) -> dict | None:
+        return self._data.get(str(channel_id))
+
+    async def set(self, channel_id: int, summary: str, last_message_id: int):
+        self._data[str(channel_id)] = {
+            "summary": summary,
+            "last_message_id": last_message_id,
+            "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        await self.save()
+
+    async def remove(self, channel_id: int) -> bool:
+        key = str(channel_id)
+        if key in self._data:
+            del self._data[key]
+            await self.save()
+            return True
+        return False
 
-        self._sounds = [
-            p for p in folder.iterdir()
-            if p.is_file() and p.suffix.lower() in self.SOUND_EXTENSIONS
-        ]
-        log("info", f"[VOICE] {len(self._sounds)} sound(s) loaded from {folder}")
-        return len(self._sounds)
 
-    @property
-    def sounds(self) -> list[pathlib.Path]:
-        return self._sounds
+summaries = ChannelSummaryStore()
 
-    # ------------------------------------------------------------------
-    # LLM: voice invitation decision
-    # ------------------------------------------------------------------
 
-    async def check_voice_invitation(
-        self,
-        message: discord.Message,
-        mention_text: str,
-    ) -> tuple[bool, str]:
-        """Ask the LLM whether the message is a voice channel invitation.
+def summary_context(channel_id: int, current_message_id: int | None = None) -> tuple[str, int]:
+    """
+    Return (summary, context_limit) for a reply in *channel_id*.
 
-        Returns:
-            (is_invitation, llm_response_text)
-            - is_invitation: True if LLM response starts with "JOIN"
-            - llm_response_text: Full LLM response to send to chat
-        """
-        if not cfg.get("ENABLE_LLM"):
-            return False, ""
+    Without a summary this is ("", LLM_CONTEXT_MESSAGES). With one, only a short
+    raw tail is needed - but never fewer messages than have arrived since the
+    summary was last updated, so nothing falls between summary and tail.
+    """
+    limit = cfg.get("LLM_CONTEXT_MESSAGES", 20)
+    entry = summaries.get(channel_id) if cfg.get("ENABLE_LLM_SUMMARY") else None
+    if not entry:
+        return "", limit
+    unsummarized = sum(
+        1 for m in history_cache.buffered(channel_id)
+        if m.id > entry["last_message_id"] and m.id != current_message_id
+    )
+    return entry["summary"], min(limit, max(cfg["LLM_SUMMARY_TAIL_MESSAGES"], unsummarized))
 
-        voice_system_prompt = (
-            "You are Bruh - a sarcastic, chaotic Discord bot deciding whether to join a voice channel. "
-            "The user's message may or may not be inviting you to voice chat. "
-            "Analyze the message and make a decision IN CHARACTER as Bruh.\n\n"
-            "STRICT OUTPUT FORMAT:\n"
-            "- If this IS a voice invitation and you want to JOIN: start your reply with 'JOIN' "
-            "(uppercase), then add your sarcastic in-character response.\n"
-            "- If this is NOT a voice invitation, or you want to DECLINE: start with 'NO' or 'DECLINE', "
-            "then your response.\n"
-            "- 1-2 sentences max after the keyword.\n"
-            "- Stay in character: sarcastic, dry, chaotic. Dark humor is fine.\n"
-            "- ONLY output the keyword + your response. Nothing else."
-        )
 
-        user_identity = format_user_identity(message)
-        prompt = (
-            f"Message from {user_identity}: \"{mention_text}\"\n\n"
-            "Is this a voice channel invitation? Decide and respond as Bruh."
-        )
+# ============================================================
+# VOICE MANAGER
+# ============================================================
 
-        try:
-            response = await query_llm(
-                prompt=prompt,
-                user_identity=user_identity,
-                history=[],
-                extra_system_prompt=voice_system_prompt,
-                channel_name=getattr(message.channel, "name", ""),
-            )
-        except Exception as e:
-            log("warning", f"[VOICE] LLM voice-check failed: {e}")
-            return False, ""
+class OggOpusFileSource(discord.AudioSource):
+    """Plays an Ogg/Opus file by handing its packets straight to discord.py.
 
-        if not response:
+    No subprocess and no re-encoding; the file is opened lazily from the
+    player thread so nothing blocks the event loop.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._file = None
+        self._packets = None
+
+    def is_opus(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        if self._packets is None:
+            self._file = open(self.path, "rb")
+            self._packets = discord.oggparse.OggStream(self._file).iter_packets()
+        for packet in self._packets:
+            # Skip the OpusHead / OpusTags header packets - only audio goes on the wire.
+            if not packet.startswith((b"OpusHead", b"OpusTags")):
+                return packet
+        return b""
+
+    def cleanup(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BufferedOpusSource(discord.AudioSource):
+    """Plays Opus packets that are already in memory (see OpusFrameCache)."""
+
+    def __init__(self, packets: list[bytes]):
+        self._packets = packets
+        self._pos = 0
+
+    def is_opus(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        if self._pos >= len(self._packets):
+            return b""
+        packet = self._packets[self._pos]
+        self._pos += 1
+        return packet
+
+
+class _TimedSource(discord.AudioSource):
+    """Wraps a source and notes when the player first asks it for audio."""
+
+    def __init__(self, inner: discord.AudioSource):
+        self.inner = inner
+        self.first_read: float | None = None
+
+    def is_opus(self) -> bool:
+        return self.inner.is_opus()
+
+    def read(self) -> bytes:
+        if self.first_read is None:
+            self.first_read = time.monotonic()
+        return self.inner.read()
+
+    def cleanup(self):
+        self.inner.cleanup()
+
+
+def read_opus_packets(path: pathlib.Path) -> list[bytes]:
+    """All audio packets of an Ogg/Opus file (header packets skipped)."""
+    with open(path, "rb") as f:
+        return [
+            packet for packet in discord.oggparse.OggStream(f).iter_packets()
+            if not packet.startswith((b"OpusHead", b"OpusTags"))
+        ]
+
+
+class OpusFrameCache:
+    """Byte-bounded in-memory cache of Opus packets for the most-played sounds.
+
+    Entries are keyed by cached file name (content hash + encoder settings),
+    so a re-encoded sound never serves stale frames. When space is needed the
+    least-played resident sound goes first (least recently used on ties), and
+    a sound is only admitted if it has been played at least as often as
+    everything it would push out.
+    """
+
+    PACKET_OVERHEAD = 40   # rough per-packet cost of a bytes object and list slot
+
+    def __init__(self, max_mb: int):
+        self.max_bytes = max(0, max_mb) * 1024 * 1024
+        self._entries: OrderedDict[str, tuple[list[bytes], int]] = OrderedDict()
+        self._bytes = 0
+        self.plays: Counter[str] = Counter()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: str) -> list[bytes] | None:
+        """Packets for *key* if resident; counts the play either way."""
+        self.plays[key] += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, packets: list[bytes]) -> bool:
+        size = sum(len(p) for p in packets) + self.PACKET_OVERHEAD * len(packets)
+        if key in self._entries or size > self.max_bytes:
+            return False
+        victims: list[str] = []
+        freed = 0
+        # Least-played first; OrderedDict order (oldest use first) breaks ties.
+        candidates = sorted(self._entries, key=lambda k: self.plays[k])
+        for victim in candidates:
+            if self._bytes - freed + size <= self.max_bytes:
+                break
+            if self.plays[victim] > self.plays[key]:
+                return False
+            victims.append(victim)
+            freed += self._entries[victim][1]
+        for victim in victims:
+            del self._entries[victim]
+        self._bytes -= freed
+        self._entries[key] = (packets, size)
+        self._bytes += size
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        rate = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        return (f"{len(self._entries)} sounds, {self._bytes / 1048576:.1f}/"
+                f"{self.max_bytes / 1048576:.0f} MB, hit rate {rate} ({self.hits}/{lookups})")
+
+
+frame_cache = OpusFrameCache(cfg["VOICE_FRAME_CACHE_MB"])
+
+
+class OpusSoundCache:
+    """Background transcoder that keeps an Ogg/Opus copy of every sound.
+
+    Cached files are named after the source's content hash plus the encoder
+    settings, so renamed sounds are reused and setting changes re-encode.
+    A manifest maps source names to (mtime, size, hash) so restarts only
+    re-hash files that changed.
+    """
+
+    MANIFEST = "index.json"
+
+    def __init__(self):
+        self.folder = BOT_DIR / cfg["VOICE_OPUS_CACHE_DIR"]
+        self._manifest: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+        self._pending: list[pathlib.Path] | None = None
+        self._ffmpeg = shutil.which("ffmpeg")
+        self.load()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(cfg.get("ENABLE_VOICE_OPUS_CACHE")) and self._ffmpeg is not None
+
+    @staticmethod
+    def _settings_tag() -> str:
+        settings = f"opus:{cfg['VOICE_OPUS_BITRATE']}:loudnorm:{cfg['VOICE_LOUDNORM_TARGET']}"
+        return hashlib.sha1(settings.encode()).hexdigest()[:8]
+
+    def load(self):
+        path = self.folder / self.MANIFEST
+        if path.exists():
+            try:
+                self._manifest = json.loads(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"⚠️  Could not load Opus cache index: {e}")
+                self._manifest = {}
+
+    def save(self):
+        atomic_write_text(self.folder / self.MANIFEST, json.dumps(self._manifest, indent=2))
+
+    def cached_path(self, source: pathlib.Path) -> pathlib.Path | None:
+        """Transcoded copy of *source*, or None if it isn't ready yet."""
+        if not cfg.get("ENABLE_VOICE_OPUS_CACHE"):
+            return None
+        entry = self._manifest.get(source.name)
+        if not entry:
+            return None
+        path = self.folder / f"{entry['hash']}-{self._settings_tag()}.ogg"
+        return path if path.exists() else None
+
+    def describe(self, total: int) -> str:
+        if not cfg.get("ENABLE_VOICE_OPUS_CACHE"):
+            return "❌ Disabled"
+        if self._ffmpeg is None:
+            return "⚠️ ffmpeg missing"
+        busy = " (transcoding…)" if self._task and not self._task.done() else ""
+        return f"{len(self._manifest)}/{total} ready{busy}"
+
+    def start_sync(self, sources: list[pathlib.Path]):
+        """Bring the cache in line with *sources* in the background.
+
+        If a sync is already running, the latest list is picked up when it ends.
+        """
+        if not self.enabled:
+            return
+        if self._task and not self._task.done():
+            self._pending = list(sources)
+            return
+        self._task = asyncio.create_task(self._sync(list(sources)), name="voice-opus-cache")
+
+    @staticmethod
+    def _fingerprint(path: pathlib.Path) -> tuple[int, int, str]:
+        st = path.stat()
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return st.st_mtime_ns, st.st_size, digest.hexdigest()[:20]
+
+    async def _transcode(self, source: pathlib.Path, target: pathlib.Path) -> bool:
+        filters = []
+        if cfg["VOICE_LOUDNORM_TARGET"]:
+            filters = ["-af", f"loudnorm=I={cfg['VOICE_LOUDNORM_TARGET']}:TP=-1.5:LRA=11"]
+        tmp = target.with_suffix(".part")
+        proc = await asyncio.create_subprocess_exec(
+            self._ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", str(source), "-vn", *filters,
+            "-ar", "48000", "-ac", "2", "-c:a", "libopus", "-b:a", f"{cfg['VOICE_OPUS_BITRATE']}k",
+            "-f", "ogg", str(tmp),
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            log("warning", "[VOICE-CACHE] ffmpeg failed for %s: %s", source.name,
+                stderr.decode(errors="replace").strip()[-300:])
+            return False
+        os.replace(tmp, target)
+        return True
+
+    def _prune(self, keep: set[str]):
+        """Delete cached files no source maps to any more and save the manifest."""
+        for stale in self.folder.glob("*.ogg"):
+            if stale.name not in keep:
+                stale.unlink(missing_ok=True)
+        self.save()
+
+    async def _sync(self, sources: list[pathlib.Path]):
+        while True:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            tag = self._settings_tag()
+            manifest: dict[str, dict] = {}
+            converted = 0
+            started = time.monotonic()
+            for source in sources:
+                try:
+                    old = self._manifest.get(source.name)
+                    st = await asyncio.to_thread(source.stat)
+                    if old and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size:
+                        entry = old
+                    else:
+                        mtime_ns, size, digest = await asyncio.to_thread(self._fingerprint, source)
+                        entry = {"mtime_ns": mtime_ns, "size": size, "hash": digest}
+                    target = self.folder / f"{entry['hash']}-{tag}.ogg"
+                    if not target.exists():
+                        if not await self._transcode(source, target):
+                            continue
+                        converted += 1
+                    manifest[source.name] = entry
+                    # Publish each file as soon as it is ready.
+                    self._manifest[source.name] = entry
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log("warning", "[VOICE-CACHE] Skipping %s: %s", source.name, e)
+
+            self._manifest = manifest
+            await asyncio.to_thread(self._prune, {f"{e['hash']}-{tag}.ogg" for e in manifest.values()})
+            if converted:
+                log("info", "[VOICE-CACHE] Transcoded %d sound(s) in %.1fs (%d cached)",
+                    converted, time.monotonic() - started, len(manifest))
+                print(f"🎵 Opus cache: transcoded {converted} sound(s), {len(manifest)} ready")
+
+            if self._pending is None:
+                return
+            sources, self._pending = self._pending, None
+
+
+sound_cache = OpusSoundCache()
+
+
+class SoundLibrary:
+    """Persistent index of SOUNDS_FOLDER shared by everything that needs the sound list.
+
+    Data format: { "file name": {"size", "mtime_ns", "duration", "loudness", "codec"} }
+    with duration in seconds and loudness in LUFS (None when ffprobe/ffmpeg is
+    missing or can't read the file).
+
+    The index is loaded from SOUND_INDEX_FILE at startup; refresh() rescans
+    the folder in a worker thread and only probes files whose size or mtime
+    changed, so callers on the event loop never touch the filesystem.
+    """
+
+    EXTENSIONS = {".mp3", ".ogg", ".wav", ".flac"}
+    _LOUDNESS_RE = re.compile(r"I:\s+(-?[\d.]+) LUFS")
+
+    def __init__(self):
+        self.folder = BOT_DIR / cfg.get("SOUNDS_FOLDER", "sounds")
+        self.path = BOT_DIR / cfg["SOUND_INDEX_FILE"]
+        self._entries: dict[str, dict] = {}
+        self.paths: list[pathlib.Path] = []
+        self._task: asyncio.Task | None = None
+        self._rescan = False
+        self._ffprobe = shutil.which("ffprobe")
+        self._ffmpeg = shutil.which("ffmpeg")
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _set_entries(self, entries: dict[str, dict]):
+        self._entries = entries
+        self.paths = [self.folder / name for name in sorted(entries)]
+
+    def load(self):
+        if self.path.exists():
+            try:
+                self._set_entries(json.loads(self.path.read_text(encoding="utf-8")))
+            except Exception as e:
+                print(f"⚠️  Could not load sound index: {e}")
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self.path, json.dumps(self._entries, indent=2))
+
+    def get(self, path: pathlib.Path) -> dict | None:
+        return self._entries.get(path.name)
+
+    def _probe(self, path: pathlib.Path) -> dict:
+        """Duration, codec and integrated loudness of one file (blocking)."""
+        info = {"duration": None, "loudness": None, "codec": None}
+        if self._ffprobe:
+            try:
+                out = subprocess.run(
+                    [self._ffprobe, "-v", "error", "-select_streams", "a:0",
+                     "-show_entries", "format=duration:stream=codec_name", "-of", "json", str(path)],
+                    capture_output=True, timeout=30, check=True,
+                ).stdout
+                data = json.loads(out or b"{}")
+                streams = data.get("streams") or [{}]
+                info["codec"] = streams[0].get("codec_name")
+                duration = (data.get("format") or {}).get("duration")
+                info["duration"] = round(float(duration), 3) if duration else None
+            except (subprocess.SubprocessError, OSError, ValueError) as e:
+                log("warning", "[VOICE] ffprobe failed for %s: %s", path.name, e)
+        if self._ffmpeg:
+            try:
+                err = subprocess.run(
+                    [self._ffmpeg, "-nostdin", "-hide_banner", "-nostats", "-i", str(path),
+                     "-vn", "-af", "ebur128=framelog=quiet", "-f", "null", "-"],
+                    capture_output=True, timeout=120,
+                ).stderr.decode(errors="replace")
+                matches = self._LOUDNESS_RE.findall(err)
+                info["loudness"] = float(matches[-1]) if matches else None
+            except (subprocess.SubprocessError, OSError) as e:
+                log("warning", "[VOICE] Loudness scan failed for %s: %s", path.name, e)
+        return info
+
+    def scan(self) -> tuple[dict[str, dict], list[pathlib.Path]]:
+        """Stat the folder (blocking). Returns the new entries and the files that need probing.
+
+        Unchanged files keep their indexed metadata; new or changed ones get a
+        stat-only entry until probe() fills it in.
+        """
+        if not self.folder.exists():
+            self.folder.mkdir(parents=True, exist_ok=True)
+            log("info", "[VOICE] Created empty sounds/ folder.")
+            return {}, []
+
+        entries: dict[str, dict] = {}
+        changed: list[pathlib.Path] = []
+        for p in self.folder.iterdir():
+            if p.suffix.lower() not in self.EXTENSIONS:
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if not p.is_file():
+                continue
+            old = self._entries.get(p.name)
+            if old and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size:
+                entries[p.name] = old
+            else:
+                entries[p.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                   "duration": None, "loudness": None, "codec": None}
+                changed.append(p)
+        return entries, changed
+
+    def probe(self, paths: list[pathlib.Path]) -> list[dict]:
+        """Probe *paths* in parallel (blocking); results are in the same order."""
+        workers = max(1, min(cfg["SOUND_SCAN_WORKERS"], len(paths)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sound-scan") as pool:
+            return list(pool.map(self._probe, paths))
+
+    def refresh(self):
+        """Rescan in the background; a refresh requested mid-scan runs once it ends."""
+        if self._task and not self._task.done():
+            self._rescan = True
+            return
+        self._task = asyncio.create_task(self._refresh(), name="sound-library-scan")
+
+    async def _refresh(self):
+        while True:
+            self._rescan = False
+            started = time.monotonic()
+            try:
+                entries, changed = await asyncio.to_thread(self.scan)
+                # Publish before probing so new files are playable right away.
+                dirty = bool(changed) or entries.keys() != self._entries.keys()
+                if dirty:
+                    self._set_entries(entries)
+                sound_cache.start_sync(self.paths)
+                if changed:
+                    infos = await asyncio.to_thread(self.probe, changed)
+                    for path, info in zip(changed, infos):
+                        entry = self._entries.get(path.name)
+                        if entry is not None:
+                            entry.update(info)
+                if dirty:
+                    await asyncio.to_thread(self.save)
+                    log("info", "[VOICE] %d sound(s) indexed from %s (%d probed in %.1fs)",
+                        len(entries), self.folder, len(changed), time.monotonic() - started)
+            except Exception as e:
+                log("error", f"[VOICE] Sound library scan failed: {e}")
+                return
+            if not self._rescan:
+                return
+
+    def describe(self) -> str:
+        """e.g. "42 sounds · 6.3 min · mp3×40, vorbis×2"."""
+        total = sum(e.get("duration") or 0 for e in self._entries.values())
+        codecs = Counter(e.get("codec") or "?" for e in self._entries.values())
+        parts = [f"{len(self._entries)} sounds"]
+        if total:
+            parts.append(f"{total / 60:.1f} min")
+        if codecs:
+            parts.append(", ".join(f"{c}×{n}" for c, n in codecs.most_common(4)))
+        return " · ".join(parts)
+
+
+sound_library = SoundLibrary()
+
+
+class VoiceManager:
+    """Manages all voice channel logic for Bruh Bot.
+
+    Responsibilities:
+      - LLM-based voice invitation detection (no hardcoded phrases)
+      - Joining / leaving voice channels
+      - Periodic random sound playback from the sounds/ folder
+      - Auto-disconnect when the bot is left alone
+    """
+
+    def __init__(self):
+        # guild_id → discord.VoiceClient
+        self._voice_clients: dict[int, discord.VoiceClient] = {}
+        # guild_id → asyncio.Task (sound loop)
+        self._sound_tasks: dict[int, asyncio.Task] = {}
+        # guild_id → humans in the bot's channel, kept up to date by on_voice_state_update
+        self._humans: dict[int, int] = {}
+        # guild_id → loop time the stay/alone timer fires, and its handle
+        self._deadlines: dict[int, float] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        # guild_id → loop time a spontaneous visit must end
+        self._stay_until: dict[int, float] = {}
+        # Disconnects started by a timer (kept referenced until done)
+        self._timer_tasks: set[asyncio.Task] = set()
+        # guild_id → "invited" or "spontaneous"
+        self._join_modes: dict[int, str] = {}
+        # guild_id → {voice channel_id → humans in it}, only channels with at least one human
+        self._populated: dict[int, dict[int, int]] = {}
+        # guild_id → timer handle of that guild's next spontaneous-join check
+        self._spontaneous_timers: dict[int, asyncio.TimerHandle] = {}
+        # Loop time before which no spontaneous check runs (startup grace period)
+        self._spontaneous_after = 0.0
+        # source kind ("memory", "disk", "ffmpeg") → recent time-to-first-audio samples (s)
+        self._first_audio: dict[str, deque[float]] = {}
+        sound_library.refresh()
+
+    # ------------------------------------------------------------------
+    # Sound file discovery
+    # ------------------------------------------------------------------
+
+    @property
+    def sounds(self) -> list[pathlib.Path]:
+        return sound_library.paths
+
+    # ------------------------------------------------------------------
+    # LLM: voice invitation decision
+    # ------------------------------------------------------------------
+
+    async def check_voice_invitation(
+        self,
+        message: discord.Message,
+        mention_text: str,
+    ) -> tuple[bool, str]:
+        """Ask the LLM whether the message is a voice channel invitation.
+
+        Returns:
+            (is_invitation, llm_response_text)
+            - is_invitation: True if LLM response starts with "JOIN"
+            - llm_response_text: Full LLM response to send to chat
+        """
+        if not cfg.get("ENABLE_LLM"):
+            return False, ""
+
+        voice_system_prompt = (
+            "You are Bruh - a sarcastic, chaotic Discord bot deciding whether to join a voice channel. "
+            "The user's message may or may not be inviting you to voice chat. "
+            "Analyze the message and make a decision IN CHARACTER as Bruh.\n\n"
+            "STRICT OUTPUT FORMAT:\n"
+            "- If this IS a voice invitation and you want to JOIN: start your reply with 'JOIN' "
+            "(uppercase), then add your sarcastic in-character response.\n"
+            "- If this is NOT a voice invitation, or you want to DECLINE: start with 'NO' or 'DECLINE', "
+            "then your response.\n"
+            "- 1-2 sentences max after the keyword.\n"
+            "- Stay in character: sarcastic, dry, chaotic. Dark humor is fine.\n"
+            "- ONLY output the keyword + your response. Nothing else."
+        )
+
+        user_identity = format_user_identity(message)
+        prompt = (
+            f"Message from {user_identity}: \"{mention_text}\"\n\n"
+            "Is this a voice channel invitation? Decide and respond as Bruh."
+        )
+
+        try:
+            response = await query_llm(
+                prompt=prompt,
+                user_identity=user_identity,
+                history=[],
+                extra_system_prompt=voice_system_prompt,
+                channel_name=getattr(message.channel, "name", ""),
+                user_id=message.author.id,
+            )
+        except Exception as e:
+            log("warning", f"[VOICE] LLM voice-check failed: {e}")
+            return False, ""
+
+        if not response:
             return False, ""
 
         first_word = response.strip().split()[0].upper().rstrip(",.!?:")
@@ -880,7 +2233,7 @@ class VoiceManager:
             await guild.change_voice_state(channel=None)
             # Give Discord's edge servers ~600 ms to propagate the reset.
             await asyncio.sleep(0.6)
-            log("debug", f"[VOICE] Stale voice state cleared for guild {guild.id}")
+            log("debug", "[VOICE] Stale voice state cleared for guild %s", guild.id)
         except Exception as e:
             log("warning", f"[VOICE] Could not clear stale state: {e}")
 
@@ -895,11 +2248,11 @@ class VoiceManager:
         """
         existing = discord.utils.get(bot.voice_clients, guild=guild)
         if existing is not None:
-            log("debug", f"[VOICE] Purging zombie VoiceClient for guild {guild.id}")
+            log("debug", "[VOICE] Purging zombie VoiceClient for guild %s", guild.id)
             try:
                 await existing.disconnect(force=True)
             except Exception as e:
-                log("debug", f"[VOICE] Zombie disconnect raised (expected): {e}")
+                log("debug", "[VOICE] Zombie disconnect raised (expected): %s", e)
             # Give the event loop one tick to flush cleanup callbacks
             await asyncio.sleep(0.2)
 
@@ -1015,24 +2368,23 @@ class VoiceManager:
         # Cleanly tear down any existing session in this guild first.
         await self.disconnect(guild_id, reason="rejoining")
 
-        # Refresh sound list each time we join.
-        self._load_sounds()
+        # Pick up added/changed sounds in the background (used from the next play on).
+        sound_library.refresh()
 
         # Send the LLM response to text chat BEFORE connecting (invited only).
         if text_channel and llm_response:
             try:
-                clean = llm_response.strip()
-                for prefix in ("JOIN ", "JOIN\n", "JOIN"):
-                    if clean.upper().startswith(prefix.upper()):
-                        clean = clean[len(prefix):].strip()
-                        break
+                clean = _strip_join_prefix(llm_response)
                 if clean:
                     await text_channel.send(clean)
             except discord.Forbidden:
                 pass
 
         # Connect — with 4006-resistant retry logic.
+        connect_started = time.monotonic()
         vc = await self._connect_with_retry(voice_channel)
+        event("voice_join", dur_ms=ms_since(connect_started), guild=guild_id,
+              channel=voice_channel.id, mode=mode, ok=vc is not None)
         if vc is None:
             log("error", f"[VOICE] Could not connect to #{voice_channel.name} after retries.")
             print(f"❌ Voice: failed to connect to #{voice_channel.name}")
@@ -1043,10 +2395,11 @@ class VoiceManager:
         log("info", f"[VOICE] Successfully joined #{voice_channel.name} in guild {guild_id} (mode={mode})")
         print(f"🎙️ Joined voice: #{voice_channel.name} (mode={mode})")
 
-        # Start the sound loop and alone-watcher.
-        if cfg.get("ENABLE_VOICE_SOUNDS") and self._sounds:
+        # Start the sound loop and the presence timers.
+        # Always start the loop: it waits for the library if the first scan isn't done yet.
+        if cfg.get("ENABLE_VOICE_SOUNDS"):
             self._start_sound_loop(guild_id, voice_channel)
-        self._start_alone_watcher(guild_id, voice_channel)
+        self._start_presence_tracking(guild_id, vc.channel or voice_channel)
         return True
 
     async def disconnect(self, guild_id: int, reason: str = "manual") -> bool:
@@ -1060,14 +2413,10 @@ class VoiceManager:
             except (asyncio.CancelledError, asyncio.TimeoutError):
                 pass
 
-        # Cancel alone-watcher
-        task = self._alone_tasks.pop(guild_id, None)
-        if task and not task.done():
-            task.cancel()
-            try:
-                await asyncio.wait_for(asyncio.shield(task), timeout=2)
-            except (asyncio.CancelledError, asyncio.TimeoutError):
-                pass
+        # Cancel the alone / stay timer
+        self._cancel_timer(guild_id)
+        self._humans.pop(guild_id, None)
+        self._stay_until.pop(guild_id, None)
 
         # Disconnect voice client
         vc = self._voice_clients.pop(guild_id, None)
@@ -1123,7 +2472,7 @@ class VoiceManager:
                     log("debug", "[VOICE] Sound loop: vc gone, exiting.")
                     break
 
-                if not self._sounds:
+                if not sound_library.paths:
                     log("debug", "[VOICE] Sound loop: no sounds available, sleeping.")
                     continue
 
@@ -1131,7 +2480,7 @@ class VoiceManager:
                     log("debug", "[VOICE] Sound loop: already playing, skipping.")
                     continue
 
-                sound_file = random.choice(self._sounds)
+                sound_file = random.choice(sound_library.paths)
                 await self._play_sound(vc, sound_file)
 
         except asyncio.CancelledError:
@@ -1145,15 +2494,15 @@ class VoiceManager:
         guild_id = vc.guild.id
         log("info", f"[VOICE] Playing sound: {path.name}")
         print(f"🔊 Playing: {path.name}")
+        started = time.monotonic()
+        source = None
 
         try:
             # Unmute
             await vc.guild.change_voice_state(channel=vc.channel, self_mute=False, self_deaf=False)
 
-            source = discord.FFmpegPCMAudio(
-                str(path),
-                options="-vn",  # skip video streams (safe for all formats)
-            )
+            inner, kind = await self._audio_source(path)
+            source = _TimedSource(inner)
 
             done_event = asyncio.Event()
 
@@ -1171,6 +2520,13 @@ class VoiceManager:
                 vc.stop()
                 log("warning", "[VOICE] Sound playback timed out, stopped.")
 
+            if source.first_read is not None:
+                first_audio = source.first_read - started
+                self._first_audio.setdefault(kind, deque(maxlen=100)).append(first_audio)
+                log("debug", "[VOICE] %s: first audio after %.0f ms (%s)", path.name, first_audio * 1000, kind)
+                event("voice_play", sound=path.name, source=kind, guild=guild_id,
+                      first_audio_ms=round(first_audio * 1000, 1), dur_ms=ms_since(started))
+
         except discord.ClientException as e:
             log("warning", f"[VOICE] ClientException during playback: {e}")
         except Exception as e:
@@ -1186,134 +2542,254 @@ class VoiceManager:
             except Exception as e:
                 log("warning", f"[VOICE] Could not re-mute: {e}")
 
+    async def _audio_source(self, path: pathlib.Path) -> tuple[discord.AudioSource, str]:
+        """Cheapest available source for *path* and its kind, for the metrics.
+
+        memory: Opus frames already in frame_cache
+        disk:   pre-transcoded Ogg/Opus file (loaded into frame_cache if it fits)
+        ffmpeg: not transcoded yet - decode and re-encode on the fly
+        """
+        cached = sound_cache.cached_path(path)
+        if cached is None:
+            source = discord.FFmpegPCMAudio(
+                str(path),
+                options="-vn",  # skip video streams (safe for all formats)
+            )
+            return source, "ffmpeg"
+
+        if not frame_cache.enabled:
+            # Pre-transcoded Opus: packets go straight to Discord.
+            return OggOpusFileSource(cached), "disk"
+
+        packets = frame_cache.get(cached.name)
+        if packets is not None:
+            return BufferedOpusSource(packets), "memory"
+        packets = await asyncio.to_thread(read_opus_packets, cached)
+        frame_cache.put(cached.name, packets)
+        return BufferedOpusSource(packets), "disk"
+
+    def first_audio_summary(self) -> str:
+        """Median time-to-first-audio per source kind, e.g. "memory 12 ms · disk 40 ms"."""
+        parts = []
+        for kind in ("memory", "disk", "ffmpeg"):
+            samples = self._first_audio.get(kind)
+            if samples:
+                median = sorted(samples)[len(samples) // 2]
+                parts.append(f"{kind} {median * 1000:.0f} ms ({len(samples)})")
+        return " · ".join(parts) or "no plays yet"
+
     # ------------------------------------------------------------------
-    # Alone-watcher
+    # Presence tracking (alone / stay timers)
     # ------------------------------------------------------------------
 
-    def _start_alone_watcher(self, guild_id: int, voice_channel: discord.VoiceChannel):
-        """Spawn the task that auto-disconnects if bot is left alone."""
-        task = asyncio.create_task(
-            self._alone_watcher(guild_id, voice_channel),
-            name=f"voice-alone-{guild_id}",
-        )
-        self._alone_tasks[guild_id] = task
-        task.add_done_callback(lambda t: self._alone_tasks.pop(guild_id, None))
+    def _start_presence_tracking(self, guild_id: int, voice_channel: discord.VoiceChannel):
+        """Seed the human count for *voice_channel* and arm the first timer.
 
-    async def _alone_watcher(self, guild_id: int, voice_channel: discord.VoiceChannel):
-        """Poll every 5s.
         - invited:     stay until channel empty for VOICE_ALONE_DISCONNECT_SECONDS.
         - spontaneous: leave after random stay duration, or immediately when alone.
         """
-        timeout = max(5, cfg.get("VOICE_ALONE_DISCONNECT_SECONDS", 30))
-        alone_since: float | None = None
-
-        mode = self._join_modes.get(guild_id, "invited")
-        stay_deadline: float | None = None
-        if mode == "spontaneous":
+        self._humans[guild_id] = sum(1 for m in voice_channel.members if not m.bot)
+        if self._join_modes.get(guild_id) == "spontaneous":
             min_stay = cfg.get("VOICE_SPONTANEOUS_MIN_STAY", 60)
             max_stay = cfg.get("VOICE_SPONTANEOUS_MAX_STAY", 300)
             stay_seconds = random.uniform(min_stay, max_stay)
-            stay_deadline = asyncio.get_event_loop().time() + stay_seconds
+            self._stay_until[guild_id] = asyncio.get_running_loop().time() + stay_seconds
             log("info", f"[VOICE] Spontaneous stay timer: {stay_seconds:.0f}s in #{voice_channel.name}")
+        self._update_timer(guild_id)
 
-        try:
-            while True:
-                await asyncio.sleep(5)
+    def _cancel_timer(self, guild_id: int):
+        handle = self._timers.pop(guild_id, None)
+        if handle is not None:
+            handle.cancel()
+        self._deadlines.pop(guild_id, None)
 
-                vc = self._voice_clients.get(guild_id)
-                if not vc or not vc.is_connected():
-                    break
+    def _arm_timer(self, guild_id: int, when: float, reason: str):
+        self._cancel_timer(guild_id)
+        self._deadlines[guild_id] = when
+        self._timers[guild_id] = asyncio.get_running_loop().call_at(when, self._on_timer, guild_id, reason)
 
-                now = asyncio.get_event_loop().time()
-                current_mode = self._join_modes.get(guild_id, "invited")
-                human_members = [m for m in vc.channel.members if not m.bot]
-
-                # ── Spontaneous mode ──────────────────────────────────
-                if current_mode == "spontaneous":
-                    if not human_members:
-                        log("info", f"[VOICE] Spontaneous: alone in #{vc.channel.name}, leaving.")
-                        print(f"🔇 Spontaneous leave: alone in #{vc.channel.name}")
-                        await self.disconnect(guild_id, reason="spontaneous-alone")
-                        break
-                    if stay_deadline and now >= stay_deadline:
-                        log("info", f"[VOICE] Spontaneous stay expired in #{vc.channel.name}, leaving.")
-                        print(f"🔇 Spontaneous leave: stay timer expired in #{vc.channel.name}")
-                        await self.disconnect(guild_id, reason="spontaneous-timeout")
-                        break
-                    continue
+    def _update_timer(self, guild_id: int):
+        """Re-evaluate the single timer for *guild_id* after a presence change."""
+        vc = self._voice_clients.get(guild_id)
+        if vc is None:
+            return
+        loop = asyncio.get_running_loop()
+        channel_name = getattr(vc.channel, "name", "?")
+        humans = self._humans.get(guild_id, 0)
+
+        # ── Spontaneous mode ──────────────────────────────────
+        if self._join_modes.get(guild_id) == "spontaneous":
+            if not humans:
+                log("info", f"[VOICE] Spontaneous: alone in #{channel_name}, leaving.")
+                self._arm_timer(guild_id, loop.time(), "spontaneous-alone")
+            elif self._deadlines.get(guild_id) != self._stay_until.get(guild_id):
+                self._arm_timer(guild_id, self._stay_until[guild_id], "spontaneous-timeout")
+            return
 
-                # ── Invited mode ──────────────────────────────────────
-                if not human_members:
-                    if alone_since is None:
-                        alone_since = now
-                        log("info", f"[VOICE] Alone in #{vc.channel.name}, starting {timeout}s timer.")
-                    elif now - alone_since >= timeout:
-                        log("info", f"[VOICE] Alone for {timeout}s, auto-disconnecting.")
-                        print(f"🔇 Auto-disconnect: alone in #{vc.channel.name} for {timeout}s.")
-                        await self.disconnect(guild_id, reason="alone-timeout")
-                        break
-                else:
-                    if alone_since is not None:
-                        log("debug", "[VOICE] Someone rejoined, resetting alone timer.")
-                    alone_since = None
+        # ── Invited mode ──────────────────────────────────────
+        if not humans:
+            if guild_id not in self._timers:
+                timeout = max(5, cfg.get("VOICE_ALONE_DISCONNECT_SECONDS", 30))
+                log("info", f"[VOICE] Alone in #{channel_name}, starting {timeout}s timer.")
+                self._arm_timer(guild_id, loop.time() + timeout, "alone-timeout")
+        elif guild_id in self._timers:
+            log("debug", "[VOICE] Someone rejoined, resetting alone timer.")
+            self._cancel_timer(guild_id)
+
+    def _on_timer(self, guild_id: int, reason: str):
+        self._timers.pop(guild_id, None)
+        self._deadlines.pop(guild_id, None)
+        vc = self._voice_clients.get(guild_id)
+        channel_name = getattr(getattr(vc, "channel", None), "name", "?")
+        if reason == "spontaneous-alone":
+            print(f"🔇 Spontaneous leave: alone in #{channel_name}")
+        elif reason == "spontaneous-timeout":
+            log("info", f"[VOICE] Spontaneous stay expired in #{channel_name}, leaving.")
+            print(f"🔇 Spontaneous leave: stay timer expired in #{channel_name}")
+        else:
+            timeout = max(5, cfg.get("VOICE_ALONE_DISCONNECT_SECONDS", 30))
+            log("info", f"[VOICE] Alone for {timeout}s, auto-disconnecting.")
+            print(f"🔇 Auto-disconnect: alone in #{channel_name} for {timeout}s.")
+        task = asyncio.create_task(self.disconnect(guild_id, reason=reason), name=f"voice-leave-{guild_id}")
+        self._timer_tasks.add(task)
+        task.add_done_callback(self._timer_tasks.discard)
+
+    def on_voice_state_update(
+        self,
+        member: discord.Member,
+        before: discord.VoiceState,
+        after: discord.VoiceState,
+    ):
+        """Keep the human count of the bot's channel current and re-arm its timer."""
+        if before.channel == after.channel:
+            return   # just a mute/deafen change
+        guild_id = member.guild.id
+        if not member.bot:
+            self._index_move(guild_id, before.channel, after.channel)
+        vc = self._voice_clients.get(guild_id)
+        if vc is None:
+            return
 
-        except asyncio.CancelledError:
-            log("debug", "[VOICE] Alone watcher cancelled.")
-        except Exception as e:
-            log("error", f"[VOICE] Alone watcher error: {e}")
+        if bot.user is not None and member.id == bot.user.id:
+            if after.channel is None:
+                # Kicked or disconnected from outside - drop the session.
+                task = asyncio.create_task(self.disconnect(guild_id, reason="disconnected"))
+                self._timer_tasks.add(task)
+                task.add_done_callback(self._timer_tasks.discard)
+            else:
+                # Moved to another channel: recount there.
+                self._humans[guild_id] = sum(1 for m in after.channel.members if not m.bot)
+                self._update_timer(guild_id)
+            return
+
+        if member.bot:
+            return
+        channel_id = vc.channel.id if vc.channel else None
+        if after.channel is not None and after.channel.id == channel_id:
+            self._humans[guild_id] = self._humans.get(guild_id, 0) + 1
+        elif before.channel is not None and before.channel.id == channel_id:
+            self._humans[guild_id] = max(0, self._humans.get(guild_id, 0) - 1)
+        else:
+            return
+        self._update_timer(guild_id)
 
     # ------------------------------------------------------------------
     # Spontaneous joins
     # ------------------------------------------------------------------
 
+    def _index_move(
+        self,
+        guild_id: int,
+        before: discord.abc.Connectable | None,
+        after: discord.abc.Connectable | None,
+    ):
+        """Move one human between channels in the populated-channel index."""
+        channels = self._populated.setdefault(guild_id, {})
+        if before is not None and before.id in channels:
+            channels[before.id] -= 1
+            if channels[before.id] <= 0:
+                del channels[before.id]
+        if isinstance(after, discord.VoiceChannel):   # stage channels are never joined
+            channels[after.id] = channels.get(after.id, 0) + 1
+
+        if channels:
+            if guild_id not in self._spontaneous_timers:
+                self._schedule_spontaneous(guild_id)
+        else:
+            del self._populated[guild_id]
+            handle = self._spontaneous_timers.pop(guild_id, None)
+            if handle is not None:
+                handle.cancel()
+
+    def _index_guild(self, guild: discord.Guild):
+        """(Re)build the index entry for *guild* from its member cache."""
+        channels = {}
+        for ch in guild.voice_channels:
+            humans = sum(1 for m in ch.members if not m.bot)
+            if humans:
+                channels[ch.id] = humans
+        if channels:
+            self._populated[guild.id] = channels
+            if guild.id not in self._spontaneous_timers:
+                self._schedule_spontaneous(guild.id)
+        else:
+            self._populated.pop(guild.id, None)
+
     def start_spontaneous_loop(self):
-        """Start the background spontaneous-join task (called from on_ready)."""
-        if not cfg.get("ENABLE_VOICE_SPONTANEOUS"):
-            return
-        self._spontaneous_task = asyncio.create_task(
-            self._spontaneous_loop(), name="voice-spontaneous"
-        )
+        """Index populated voice channels and arm per-guild join checks (called from on_ready).
 
-    async def _spontaneous_loop(self):
-        """Periodically scan guilds and randomly join a populated voice channel."""
-        check_interval = max(30, cfg.get("VOICE_SPONTANEOUS_CHECK_INTERVAL", 300))
-        join_chance = cfg.get("VOICE_SPONTANEOUS_JOIN_CHANCE", 25)
+        The index is kept current by on_voice_state_update, so checks only run
+        for guilds where someone is in voice, each on its own jittered timer.
+        """
+        self._spontaneous_after = asyncio.get_running_loop().time() + 60
+        self.reindex_guilds()
 
-        try:
-            await asyncio.sleep(60)
-            while True:
-                await asyncio.sleep(check_interval)
+    def reindex_guilds(self):
+        """Rebuild the populated-channel index for every guild (e.g. after a reconnect).
 
-                if not cfg.get("ENABLE_VOICE_SPONTANEOUS"):
-                    continue
+        Guilds that already have a check armed keep their timer.
+        """
+        for guild in bot.guilds:
+            self._index_guild(guild)
 
-                for guild in bot.guilds:
-                    if self.is_connected(guild.id):
-                        continue
-                    populated = [
-                        ch for ch in guild.voice_channels
-                        if any(not m.bot for m in ch.members)
-                    ]
-                    if not populated:
-                        continue
-                    if random.randint(1, 100) > join_chance:
-                        continue
-                    channel = random.choice(populated)
-                    log("info", f"[VOICE] Spontaneously joining #{channel.name} in {guild.name}")
-                    print(f"🎲 Spontaneous join: #{channel.name} in {guild.name}")
-                    await self.join_voice(
-                        guild_id=guild.id,
-                        voice_channel=channel,
-                        text_channel=None,
-                        llm_response="",
-                        mode="spontaneous",
-                    )
+    def _schedule_spontaneous(self, guild_id: int):
+        if not cfg.get("ENABLE_VOICE_SPONTANEOUS"):
+            return
+        loop = asyncio.get_running_loop()
+        check_interval = max(30, cfg.get("VOICE_SPONTANEOUS_CHECK_INTERVAL", 300))
+        # ±50% jitter keeps guilds from all being checked on the same tick.
+        when = max(loop.time(), self._spontaneous_after) + check_interval * random.uniform(0.5, 1.5)
+        self._spontaneous_timers[guild_id] = loop.call_at(when, self._spontaneous_check, guild_id)
+
+    def _spontaneous_check(self, guild_id: int):
+        """Timer callback: maybe join a populated channel in *guild_id*, then re-arm."""
+        self._spontaneous_timers.pop(guild_id, None)
+        channels = self._populated.get(guild_id)
+        guild = bot.get_guild(guild_id)
+        if not channels or guild is None:
+            self._populated.pop(guild_id, None)
+            return
+        self._schedule_spontaneous(guild_id)
 
-        except asyncio.CancelledError:
-            log("debug", "[VOICE] Spontaneous loop cancelled.")
-        except Exception as e:
-            log("error", f"[VOICE] Spontaneous loop error: {e}")
-            print(f"❌ Spontaneous loop error: {e}")
+        if self.is_connected(guild_id):
+            return
+        join_chance = cfg.get("VOICE_SPONTANEOUS_JOIN_CHANCE", 25)
+        if random.randint(1, 100) > join_chance:
+            return
+        channel = guild.get_channel(random.choice(list(channels)))
+        if channel is None:
+            return
+        log("info", f"[VOICE] Spontaneously joining #{channel.name} in {guild.name}")
+        print(f"🎲 Spontaneous join: #{channel.name} in {guild.name}")
+        task = asyncio.create_task(self.join_voice(
+            guild_id=guild_id,
+            voice_channel=channel,
+            text_channel=None,
+            llm_response="",
+            mode="spontaneous",
+        ), name=f"voice-spontaneous-{guild_id}")
+        self._timer_tasks.add(task)
+        task.add_done_callback(self._timer_tasks.discard)
 
     # ------------------------------------------------------------------
     # Status info
@@ -1338,7 +2814,12 @@ class VoiceManager:
         )
         embed.add_field(
             name="Sounds loaded",
-            value=str(len(self._sounds)),
+            value=str(len(sound_library)),
+            inline=True,
+        )
+        embed.add_field(
+            name="Opus cache",
+            value=sound_cache.describe(len(sound_library)),
             inline=True,
         )
         embed.add_field(
@@ -1354,12 +2835,33 @@ class VoiceManager:
             ),
             inline=True,
         )
+        embed.add_field(
+            name="Guilds with people in voice",
+            value=str(len(self._populated)),
+            inline=True,
+        )
         embed.add_field(
             name="Alone timeout",
             value=f"{cfg.get('VOICE_ALONE_DISCONNECT_SECONDS', 30)}s",
             inline=True,
         )
 
+        embed.add_field(
+            name="Sound library",
+            value=sound_library.describe(),
+            inline=False,
+        )
+        embed.add_field(
+            name="Frame cache",
+            value=frame_cache.stats() if frame_cache.enabled else "❌ Disabled",
+            inline=False,
+        )
+        embed.add_field(
+            name="Time to first audio (median)",
+            value=self.first_audio_summary(),
+            inline=False,
+        )
+
         if self._voice_clients:
             lines = []
             for gid, vc in self._voice_clients.items():
@@ -1448,7 +2950,7 @@ def _check_attention_window(message: discord.Message, bot_user: discord.ClientUs
     now = discord.utils.utcnow()
     if window["expires"] <= now:
         attention_windows.pop(channel_id, None)
-        log("debug", f"[ATTENTION] Window expired for channel {channel_id}")
+        log("debug", "[ATTENTION] Window expired for channel %s", channel_id)
         return False
 
     # If they're replying to another message, check who they're replying to.
@@ -1504,7 +3006,7 @@ def _schedule_debounced_reply(
     existing = _debounce_tasks.get(channel_id)
     if existing and not existing.done():
         existing.cancel()
-        log("debug", f"[DEBOUNCE] Cancelled previous task for channel {channel_id}")
+        log("debug", "[DEBOUNCE] Cancelled previous task for channel %s", channel_id)
 
     # Store the latest message so the fired task uses it
     _debounce_last_message[channel_id] = message
@@ -1522,11 +3024,11 @@ def _schedule_debounced_reply(
         final_text = get_mention_text(last_msg, bot.user) or last_msg.content
         final_identity = format_user_identity(last_msg)
 
-        log("debug", f"[DEBOUNCE] Firing for channel {channel_id} | {final_identity}")
+        log("debug", "[DEBOUNCE] Firing for channel %s | %s", channel_id, final_identity)
 
         if cfg["ENABLE_LLM"]:
             if cfg["LLM_PERCENTAGE"] and random.randint(1, 100) > cfg["LLM_PERCENTAGE_VALUE"]:
-                log("debug", f"[LLM] Skipped (percentage gate) for {final_identity}")
+                log("debug", "[LLM] Skipped (percentage gate) for %s", final_identity)
                 channel_info = f"#{last_msg.channel}" if hasattr(last_msg.channel, "name") else "DM"
                 if msgs.mention:
                     fallback = random.choice(msgs.mention)
@@ -1536,7 +3038,7 @@ def _schedule_debounced_reply(
                     except discord.Forbidden:
                         pass
                 return
-            await handle_llm_mention(last_msg, final_text, final_identity)
+            await handle_llm_mention(last_msg, final_text, final_identity, source)
         else:
             if msgs.mention:
                 fallback = random.choice(msgs.mention)
@@ -1555,63 +3057,259 @@ def _schedule_debounced_reply(
     _debounce_tasks[channel_id] = task
 
 
+# ============================================================
+# LLM RATE LIMITING
+# ============================================================
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key: up to *burst* tokens, refilled at *per_minute*.
+
+    Buckets are stored as (tokens, last_update) and refilled lazily when
+    looked at, so idle keys cost nothing until they are pruned.
+    """
+
+    def __init__(self, burst: int, per_minute: int):
+        self.burst = max(1, burst)
+        self.rate = per_minute / 60.0                 # tokens per second
+        self._buckets: dict[int, tuple[float, float]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _tokens(self, key: int, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def available(self, key: int, now: float) -> bool:
+        return not self.enabled or self._tokens(key, now) >= 1
+
+    def take(self, key: int, now: float):
+        if not self.enabled:
+            return
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        if len(self._buckets) > 10_000:
+            # Forget buckets that have refilled completely - they are identical to new ones.
+            self._buckets = {k: v for k, v in self._buckets.items() if self._tokens(k, now) < self.burst}
+
+
+_llm_user_limiter    = TokenBucketLimiter(cfg["LLM_RATE_USER_BURST"], cfg["LLM_RATE_USER_PER_MINUTE"])
+_llm_channel_limiter = TokenBucketLimiter(cfg["LLM_RATE_CHANNEL_BURST"], cfg["LLM_RATE_CHANNEL_PER_MINUTE"])
+_llm_guild_limiter   = TokenBucketLimiter(cfg["LLM_RATE_GUILD_BURST"], cfg["LLM_RATE_GUILD_PER_MINUTE"])
+
+
+def llm_rate_limited(message: discord.Message) -> str | None:
+    """
+    Take one token from the user, channel and guild buckets for *message*.
+
+    Tokens are only taken when all buckets have one. Returns the name of the
+    limit that was hit, or None if the message may use the LLM.
+    """
+    now = time.monotonic()
+    checks = [("user", _llm_user_limiter, message.author.id),
+              ("channel", _llm_channel_limiter, message.channel.id)]
+    if message.guild:
+        checks.append(("guild", _llm_guild_limiter, message.guild.id))
+
+    for name, limiter, key in checks:
+        if not limiter.available(key, now):
+            return name
+    for _, limiter, key in checks:
+        limiter.take(key, now)
+    return None
+
+
 # ============================================================
 # VISION HELPERS
 # ============================================================
 
-async def fetch_image_as_base64(url: str, max_mb: int) -> tuple[str, str] | None:
-    """Download an image and return (base64_string, mime_type) or None.
+async def fetch_image_bytes(url: str, max_bytes: int) -> tuple[bytes, str] | None:
+    """Download an image over the shared session and return (data, mime_type) or None.
 
-    Skips images larger than max_mb MB. Derives mime_type from Content-Type header,
-    defaulting to 'image/png' if missing.
+    Gives up before reading the body if Content-Length is over *max_bytes*, and
+    stops reading as soon as the streamed body passes it, so oversized files are
+    never fully buffered. Derives mime_type from Content-Type, defaulting to
+    'image/png' if missing.
     """
-    max_bytes = max_mb * 1024 * 1024
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    log("warning", f"[VISION] Failed to download image: HTTP {resp.status}")
-                    return None
-                data = await resp.read()
-                if len(data) > max_bytes:
-                    log("info", f"[VISION] Skipping image: {len(data)} bytes exceeds {max_mb} MB")
+        session = get_http_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            if resp.status != 200:
+                log("warning", f"[VISION] Failed to download image: HTTP {resp.status}")
+                return None
+            if resp.content_length is not None and resp.content_length > max_bytes:
+                log("info", f"[VISION] Skipping image: Content-Length {resp.content_length} exceeds {max_bytes} bytes")
+                return None
+            buf = bytearray()
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                buf.extend(chunk)
+                if len(buf) > max_bytes:
+                    log("info", f"[VISION] Skipping image: body exceeds {max_bytes} bytes")
                     return None
-                mime_type = resp.headers.get("Content-Type", "image/png")
-                if not mime_type.startswith("image/"):
-                    mime_type = "image/png"
-                b64 = base64.b64encode(data).decode("utf-8")
-                return (b64, mime_type)
+            mime_type = resp.headers.get("Content-Type", "image/png")
+            if not mime_type.startswith("image/"):
+                mime_type = "image/png"
+            return bytes(buf), mime_type
     except Exception as e:
         log("warning", f"[VISION] Error fetching image: {e}")
         return None
 
 
+def _prepare_vision_image(data: bytes, mime_type: str) -> tuple[bytes, str]:
+    """Downscale, strip metadata and re-encode an image before it goes to the LLM.
+
+    CPU-bound; runs in a worker thread. Returns the input unchanged if Pillow
+    cannot decode it.
+    """
+    fmt = cfg.get("LLM_VISION_FORMAT", "jpeg").lower()
+    if fmt not in ("jpeg", "webp"):
+        fmt = "jpeg"
+    max_edge = max(64, cfg.get("LLM_VISION_MAX_EDGE", 1568))
+    quality = min(100, max(1, cfg.get("LLM_VISION_QUALITY", 85)))
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.seek(0)                        # first frame of animated GIF/WebP
+            img = ImageOps.exif_transpose(img)  # bake in phone rotation before EXIF is dropped
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if has_alpha and fmt == "jpeg":
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            elif has_alpha:
+                img = img.convert("RGBA")
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+
+            out = io.BytesIO()
+            if fmt == "webp":
+                img.save(out, format="WEBP", quality=quality, method=4)
+            else:
+                img.save(out, format="JPEG", quality=quality, optimize=True)
+            return out.getvalue(), f"image/{fmt}"
+    except Exception as e:
+        log("warning", f"[VISION] Could not re-encode image, sending original: {e}")
+        return data, mime_type
+
+
+async def fetch_image_as_base64(url: str, max_mb: int) -> tuple[str, str] | None:
+    """Download an image and return (base64_string, mime_type) or None.
+
+    Skips images larger than max_mb MB. With ENABLE_LLM_VISION_RESIZE the image
+    is downscaled and re-encoded off the event loop before encoding.
+    """
+    result = await fetch_image_bytes(url, max_mb * 1024 * 1024)
+    if result is None:
+        return None
+    data, mime_type = result
+
+    if cfg.get("ENABLE_LLM_VISION_RESIZE"):
+        started = time.perf_counter()
+        original_size = len(data)
+        data, mime_type = await asyncio.to_thread(_prepare_vision_image, data, mime_type)
+        log("info", f"[VISION] Prepared image: {original_size} → {len(data)} bytes ({mime_type}) "
+                    f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    return base64.b64encode(data).decode("utf-8"), mime_type
+
+
+# Caps simultaneous image downloads across all messages being handled.
+_vision_download_slots = asyncio.Semaphore(max(1, cfg["LLM_VISION_CONCURRENCY"]))
+
+
+DISCORD_CDN_HOSTS = {"cdn.discordapp.com", "media.discordapp.net"}
+
+
 async def collect_message_images(message: discord.Message, max_mb: int) -> list[tuple[str, str]]:
     """Collect images from message attachments and embeds.
 
-    Returns a list of (base64_data, mime_type) tuples.
+    Downloads run concurrently (bounded by LLM_VISION_CONCURRENCY); the same
+    image linked from both an attachment and an embed is fetched once.
+    Returns a list of (base64_data, mime_type) tuples in message order.
     """
-    images: list[tuple[str, str]] = []
+    max_bytes = max_mb * 1024 * 1024
+    urls: list[str] = []
 
     # Check attachments
     for attachment in message.attachments:
         if attachment.content_type and attachment.content_type.startswith("image/"):
-            result = await fetch_image_as_base64(attachment.url, max_mb)
-            if result:
-                images.append(result)
+            if attachment.size > max_bytes:
+                log("info", f"[VISION] Skipping attachment {attachment.filename}: "
+                            f"{attachment.size} bytes exceeds {max_mb} MB")
+                continue
+            urls.append(attachment.url)
 
     # Check embeds for image/thumbnail URLs
     for embed in message.embeds:
         for url in (embed.image.url, embed.thumbnail.url):
             if url:
-                result = await fetch_image_as_base64(url, max_mb)
-                if result:
-                    images.append(result)
+                urls.append(url)
+
+    # Deduplicate Discord CDN links without their query string (they carry
+    # per-request signature params that differ for the same file). For any
+    # other host the query string may be what identifies the image.
+    unique: dict[str, str] = {}
+    for url in urls:
+        parts = urllib.parse.urlsplit(url)
+        key = parts._replace(query="").geturl() if parts.hostname in DISCORD_CDN_HOSTS else url
+        unique.setdefault(key, url)
+
+    async def _fetch(url: str) -> tuple[str, str] | None:
+        async with _vision_download_slots:
+            return await fetch_image_as_base64(url, max_mb)
+
+    results = await asyncio.gather(*(_fetch(url) for url in unique.values()))
+    images = [r for r in results if r]
 
     log("info", f"[VISION] Collected {len(images)} image(s) from message")
     return images
 
 
+# ============================================================
+# SHARED HTTP SESSION
+# ============================================================
+
+# One long-lived session for all outgoing HTTP (LLM providers, /llm-status,
+# heartbeat). Created in BruhBot.setup_hook and closed in BruhBot.close.
+_http_session: aiohttp.ClientSession | None = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared pooled session, creating it on first use.
+
+    Timeouts are passed per request, never set on the session itself.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        dns_ttl = cfg.get("LLM_HTTP_DNS_CACHE_SECONDS", 300)
+        connector = aiohttp.TCPConnector(
+            limit_per_host=max(1, cfg.get("LLM_HTTP_MAX_CONNECTIONS_PER_HOST", 8)),
+            keepalive_timeout=max(1, cfg.get("LLM_HTTP_KEEPALIVE_SECONDS", 60)),
+            use_dns_cache=dns_ttl > 0,
+            ttl_dns_cache=dns_ttl if dns_ttl > 0 else None,
+        )
+        _http_session = aiohttp.ClientSession(connector=connector)
+        log("debug", "[HTTP] Shared session created")
+    return _http_session
+
+
+async def close_http_session():
+    """Close the shared session (called on bot shutdown)."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+        log("debug", "[HTTP] Shared session closed")
+    _http_session = None
+
+
+def _llm_timeout(target: dict) -> aiohttp.ClientTimeout:
+    """Per-request timeout for calls to one provider chain entry."""
+    return aiohttp.ClientTimeout(total=target["timeout"])
+
+
 # ============================================================
 # LLM CLIENT
 # ============================================================
@@ -1622,12 +3320,46 @@ def _build_messages(
     history: list[dict],
     extra_system_prompt: str = "",
     channel_name: str = "",
+    system_prompt: str | None = None,
+    summary: str = "",
 ) -> list[dict]:
+    persona = cfg["LLM_SYSTEM_PROMPT"] if system_prompt is None else system_prompt
+    summary_text = f"Summary of the earlier conversation in this channel:\n{summary}" if summary else ""
     channel_ctx = (
         f"\nYou are currently active in channel: #{channel_name}." if channel_name else ""
     )
+    budget = context_token_budget(cfg.get("LLM_PROVIDER", "ollama"), cfg["LLM_MODEL"])
+    if budget > 0:
+        # Reserve room for the system prompt, the extra instructions and the message itself.
+        reserved = (approx_tokens(persona) + approx_tokens(summary_text)
+                    + approx_tokens(extra_system_prompt) + approx_tokens(prompt) + 100)
+        history = fit_history_to_budget(history, max(0, budget - reserved))
+
+    if cfg.get("LLM_STABLE_PROMPT_PREFIX"):
+        # The system message never changes, so it forms a cacheable prefix; the
+        # per-request facts ride along with the latest message at the tail.
+        system_prompt = (
+            persona
+            + "\n\nYou are participating in a group Discord chat. Multiple people may talk to you."
+            + "\nBe aware of what others said, who said it, and when."
+        )
+        facts = (
+            f"[{channel_ctx.strip()} The person currently addressing you is: {user_identity}]"
+            if channel_ctx else f"[The person currently addressing you is: {user_identity}]"
+        )
+        if extra_system_prompt:
+            facts += f"\n{extra_system_prompt}"
+        if summary_text:
+            # Per channel and rewritten after every fold - keep it out of the system message.
+            facts = f"[{summary_text}]\n{facts}"
+        msgs_out = [{"role": "system", "content": system_prompt}]
+        msgs_out.extend(history)
+        msgs_out.append({"role": "user", "content": f"{facts}\n\n[{user_identity}]: {prompt}"})
+        return msgs_out
+
     system_prompt = (
-        cfg["LLM_SYSTEM_PROMPT"]
+        persona
+        + (f"\n\n{summary_text}" if summary_text else "")
         + (f"\n\n{extra_system_prompt}" if extra_system_prompt else "")
         + f"\n\nYou are participating in a group Discord chat. Multiple people may talk to you."
         + channel_ctx
@@ -1640,14 +3372,74 @@ def _build_messages(
     return msgs_out
 
 
-async def _query_ollama(messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
-    url = f"{cfg['LLM_BASE_URL']}/api/chat"
+_llm_prompt_tokens = {"prompt": 0, "cached": 0}   # totals for providers that report cache hits
+# Token counts of the provider call in progress, filled by _log_usage for the event log
+_llm_call_usage: contextvars.ContextVar[dict | None] = contextvars.ContextVar("llm_call_usage", default=None)
+
+
+def _log_usage(target: dict, data: dict):
+    """Log prompt and cached-prompt token counts from a provider response (or final stream event)."""
+    provider = target["provider"]
+    cached = None
+    if provider in ("ollama", "ollama_cloud"):
+        # Ollama only reports the prompt tokens it had to evaluate - a warm KV cache keeps this small.
+        prompt = data.get("prompt_eval_count")
+        completion = data.get("eval_count")
+    elif provider == "anthropic":
+        usage = data.get("usage") or {}
+        cached = usage.get("cache_read_input_tokens") or 0
+        prompt = (usage.get("input_tokens") or 0) + cached + (usage.get("cache_creation_input_tokens") or 0)
+        completion = usage.get("output_tokens")
+    elif provider == "gemini":
+        usage = data.get("usageMetadata") or {}
+        prompt = usage.get("promptTokenCount")
+        cached = usage.get("cachedContentTokenCount") or 0
+        completion = usage.get("candidatesTokenCount")
+    elif provider == "openmodel":
+        usage = data.get("usage") or {}
+        prompt = usage.get("input_tokens")
+        cached = (usage.get("input_tokens_details") or {}).get("cached_tokens")
+        completion = usage.get("output_tokens")
+    else:
+        usage = data.get("usage") or {}
+        prompt = usage.get("prompt_tokens")
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        completion = usage.get("completion_tokens")
+
+    call_usage = _llm_call_usage.get()
+    if call_usage is not None:
+        for key, value in (("prompt_tokens", prompt), ("cached_tokens", cached), ("completion_tokens", completion)):
+            if value is not None:
+                call_usage[key] = value
+
+    if prompt is None:
+        return
+    if cached is None:
+        log("debug", "[LLM-USAGE] %s | prompt tokens evaluated=%s", target["name"], prompt)
+        return
+    _llm_prompt_tokens["prompt"] += prompt
+    _llm_prompt_tokens["cached"] += cached
+    log("debug", "[LLM-USAGE] %s | prompt tokens=%s cached=%s", target["name"], prompt, cached)
+
+
+def _ollama_keep_alive() -> str | int | None:
+    value = str(cfg.get("LLM_OLLAMA_KEEP_ALIVE", "")).strip()
+    if not value:
+        return None
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def _ollama_request(target: dict, messages: list[dict], images: list[tuple[str, str]] | None, stream: bool) -> tuple[str, dict, dict]:
+    url = f"{target['base_url']}/api/chat"
     payload = {
-        "model": cfg["LLM_MODEL"],
-        "stream": False,
+        "model": target["model"],
+        "stream": stream,
         "options": {"num_predict": cfg["LLM_MAX_TOKENS"]},
         "messages": messages,
     }
+    keep_alive = _ollama_keep_alive()
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
 
     # Vision support: add images to last user message
     if images:
@@ -1655,34 +3447,39 @@ async def _query_ollama(messages: list[dict], session: aiohttp.ClientSession, im
             if messages[i]["role"] == "user":
                 messages[i]["images"] = [b64 for b64, _ in images]
                 break
+    return url, {}, payload
 
-    async with session.post(url, json=payload) as resp:
+
+async def _query_ollama(target: dict, messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+    url, _, payload = _ollama_request(target, messages, images, stream=False)
+    async with session.post(url, json=payload, timeout=_llm_timeout(target)) as resp:
         if resp.status != 200:
             print(f"❌ Ollama returned HTTP {resp.status}: {await resp.text()}")
             return None
         data = await resp.json()
+        _log_usage(target, data)
         return data.get("message", {}).get("content", "").strip()
 
 
-async def _query_ollama_cloud(messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
-    """Query the Ollama Cloud API at ollama.com using Bearer token auth.
+def _ollama_cloud_request(target: dict, messages: list[dict], images: list[tuple[str, str]] | None, stream: bool) -> tuple[str, dict, dict] | None:
+    """Build an Ollama Cloud request (ollama.com, Bearer token auth).
 
     Note: 'options' (num_predict etc.) is a local-Ollama-only field.
     The cloud endpoint ignores/rejects it, causing empty responses - so it is omitted.
     """
-    api_key = cfg.get("LLM_API_KEY", "").strip()
+    api_key = target["api_key"]
     if not api_key:
         print("❌ ollama_cloud requires LLM_API_KEY. Get one at https://ollama.com/settings/keys")
         return None
 
-    url = f"{cfg['LLM_BASE_URL'].rstrip('/')}/api/chat"
+    url = f"{target['base_url'].rstrip('/')}/api/chat"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}",
     }
     payload = {
-        "model": cfg["LLM_MODEL"],
-        "stream": False,
+        "model": target["model"],
+        "stream": stream,
         "messages": messages,
     }
 
@@ -1692,7 +3489,15 @@ async def _query_ollama_cloud(messages: list[dict], session: aiohttp.ClientSessi
             if messages[i]["role"] == "user":
                 messages[i]["images"] = [b64 for b64, _ in images]
                 break
-    async with session.post(url, json=payload, headers=headers) as resp:
+    return url, headers, payload
+
+
+async def _query_ollama_cloud(target: dict, messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+    request = _ollama_cloud_request(target, messages, images, stream=False)
+    if request is None:
+        return None
+    url, headers, payload = request
+    async with session.post(url, json=payload, headers=headers, timeout=_llm_timeout(target)) as resp:
         if resp.status == 401:
             print("❌ Ollama Cloud: Unauthorized - check your LLM_API_KEY.")
             return None
@@ -1700,18 +3505,19 @@ async def _query_ollama_cloud(messages: list[dict], session: aiohttp.ClientSessi
             print(f"❌ Ollama Cloud returned HTTP {resp.status}: {await resp.text()}")
             return None
         data = await resp.json()
+        _log_usage(target, data)
         content = data.get("message", {}).get("content", "").strip()
         if not content:
             print(f"⚠️  Ollama Cloud returned empty content. Raw response: {data}")
         return content or None
 
 
-async def _query_openai_compat(messages: list[dict], session: aiohttp.ClientSession,
-                                 base_url: str, api_key: str, images: list[tuple[str, str]] | None = None) -> str | None:
-    url = f"{base_url.rstrip('/')}/v1/chat/completions"
+def _openai_compat_request(target: dict, messages: list[dict],
+                           images: list[tuple[str, str]] | None, stream: bool) -> tuple[str, dict, dict]:
+    url = f"{target['base_url'].rstrip('/')}/v1/chat/completions"
     headers = {"Content-Type": "application/json"}
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
+    if target["api_key"]:
+        headers["Authorization"] = f"Bearer {target['api_key']}"
 
     # Vision support: change last user message to multimodal content
     if images:
@@ -1727,19 +3533,30 @@ async def _query_openai_compat(messages: list[dict], session: aiohttp.ClientSess
                 break
 
     payload = {
-        "model": cfg["LLM_MODEL"],
+        "model": target["model"],
         "max_tokens": cfg["LLM_MAX_TOKENS"],
         "messages": messages,
     }
-    async with session.post(url, json=payload, headers=headers) as resp:
+    if stream:
+        payload["stream"] = True
+        if target["provider"] == "openai":
+            payload["stream_options"] = {"include_usage": True}
+    return url, headers, payload
+
+
+async def _query_openai_compat(target: dict, messages: list[dict], session: aiohttp.ClientSession,
+                                 images: list[tuple[str, str]] | None = None) -> str | None:
+    url, headers, payload = _openai_compat_request(target, messages, images, stream=False)
+    async with session.post(url, json=payload, headers=headers, timeout=_llm_timeout(target)) as resp:
         if resp.status != 200:
-            print(f"❌ LLM ({base_url}) returned HTTP {resp.status}: {await resp.text()}")
+            print(f"❌ LLM ({target['base_url']}) returned HTTP {resp.status}: {await resp.text()}")
             return None
         data = await resp.json()
+        _log_usage(target, data)
         return data["choices"][0]["message"]["content"].strip()
 
 
-async def _query_anthropic(messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+def _anthropic_request(target: dict, messages: list[dict], images: list[tuple[str, str]] | None, stream: bool) -> tuple[str, dict, dict]:
     system_text = ""
     chat_messages = []
     for m in messages:
@@ -1761,23 +3578,34 @@ async def _query_anthropic(messages: list[dict], session: aiohttp.ClientSession,
                 chat_messages[i]["content"] = content
                 break
 
-    url = f"{cfg['LLM_BASE_URL'].rstrip('/')}/v1/messages"
+    url = f"{target['base_url'].rstrip('/')}/v1/messages"
     headers = {
         "Content-Type": "application/json",
-        "x-api-key": cfg["LLM_API_KEY"],
+        "x-api-key": target["api_key"],
         "anthropic-version": "2023-06-01",
     }
     payload = {
-        "model": cfg["LLM_MODEL"],
+        "model": target["model"],
         "max_tokens": cfg["LLM_MAX_TOKENS"],
         "system": system_text,
         "messages": chat_messages,
     }
-    async with session.post(url, json=payload, headers=headers) as resp:
+    if cfg.get("LLM_STABLE_PROMPT_PREFIX") and system_text:
+        # Mark the (byte-stable) system prompt as a cache breakpoint
+        payload["system"] = [{"type": "text", "text": system_text, "cache_control": {"type": "ephemeral"}}]
+    if stream:
+        payload["stream"] = True
+    return url, headers, payload
+
+
+async def _query_anthropic(target: dict, messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+    url, headers, payload = _anthropic_request(target, messages, images, stream=False)
+    async with session.post(url, json=payload, headers=headers, timeout=_llm_timeout(target)) as resp:
         if resp.status != 200:
             print(f"❌ Anthropic returned HTTP {resp.status}: {await resp.text()}")
             return None
         data = await resp.json()
+        _log_usage(target, data)
         for block in data["content"]:
             if block["type"] == "text":
                 return block["text"].strip()
@@ -1785,7 +3613,7 @@ async def _query_anthropic(messages: list[dict], session: aiohttp.ClientSession,
         return None
 
 
-async def _query_gemini(messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+def _gemini_request(target: dict, messages: list[dict], images: list[tuple[str, str]] | None, stream: bool) -> tuple[str, dict, dict]:
     system_text = ""
     contents = []
     for m in messages:
@@ -1803,9 +3631,11 @@ async def _query_gemini(messages: list[dict], session: aiohttp.ClientSession, im
                     contents[i]["parts"].insert(0, {"inline_data": {"mime_type": mime, "data": b64}})
                 break
 
+    # streamGenerateContent with alt=sse returns server-sent events instead of a JSON array
+    method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
     url = (
-        f"{cfg['LLM_BASE_URL'].rstrip('/')}/v1beta/models/"
-        f"{cfg['LLM_MODEL']}:generateContent?key={cfg['LLM_API_KEY']}"
+        f"{target['base_url'].rstrip('/')}/v1beta/models/"
+        f"{target['model']}:{method}key={target['api_key']}"
     )
     payload: dict = {
         "contents": contents,
@@ -1813,22 +3643,27 @@ async def _query_gemini(messages: list[dict], session: aiohttp.ClientSession, im
     }
     if system_text:
         payload["systemInstruction"] = {"parts": [{"text": system_text}]}
+    return url, {}, payload
 
-    async with session.post(url, json=payload) as resp:
+
+async def _query_gemini(target: dict, messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+    url, _, payload = _gemini_request(target, messages, images, stream=False)
+    async with session.post(url, json=payload, timeout=_llm_timeout(target)) as resp:
         if resp.status != 200:
             print(f"❌ Gemini returned HTTP {resp.status}: {await resp.text()}")
             return None
         data = await resp.json()
+        _log_usage(target, data)
         return data["candidates"][0]["content"]["parts"][0]["text"].strip()
 
 
-async def _query_openmodel(messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
-    api_key = cfg.get("LLM_API_KEY", "").strip()
+async def _query_openmodel(target: dict, messages: list[dict], session: aiohttp.ClientSession, images: list[tuple[str, str]] | None = None) -> str | None:
+    api_key = target["api_key"]
     if not api_key:
         print("❌ openmodel requires LLM_API_KEY. Get one at https://console.openmodel.ai")
         return None
 
-    url = f"{cfg['LLM_BASE_URL'].rstrip('/')}/v1/responses"
+    url = f"{target['base_url'].rstrip('/')}/v1/responses"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}",
@@ -1856,14 +3691,14 @@ async def _query_openmodel(messages: list[dict], session: aiohttp.ClientSession,
             input_items.append({"role": role, "content": [{"type": content_type, "text": text}]})
 
     payload: dict = {
-        "model": cfg["LLM_MODEL"],
+        "model": target["model"],
         "input": input_items,
         "max_output_tokens": cfg["LLM_MAX_TOKENS"],
     }
     if instructions:
         payload["instructions"] = instructions
 
-    async with session.post(url, json=payload, headers=headers) as resp:
+    async with session.post(url, json=payload, headers=headers, timeout=_llm_timeout(target)) as resp:
         if resp.status == 401:
             print("❌ openmodel: Unauthorized - check your LLM_API_KEY.")
             return None
@@ -1871,6 +3706,7 @@ async def _query_openmodel(messages: list[dict], session: aiohttp.ClientSession,
             print(f"❌ openmodel returned HTTP {resp.status}: {await resp.text()}")
             return None
         data = await resp.json()
+        _log_usage(target, data)
         try:
             return data["output"][0]["content"][0]["text"].strip()
         except (KeyError, IndexError) as e:
@@ -1878,6 +3714,582 @@ async def _query_openmodel(messages: list[dict], session: aiohttp.ClientSession,
             return None
 
 
+# ------------------------------------------------------------
+# Streaming
+# ------------------------------------------------------------
+
+# Providers whose chat endpoint can stream partial output (NDJSON or SSE).
+STREAMING_PROVIDERS = {
+    "ollama", "ollama_cloud", "anthropic", "gemini",
+    "openai", "lmstudio", "groq", "openrouter", "openai_compat",
+}
+
+
+async def _iter_ndjson(resp: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+    """Yield one parsed object per line of a newline-delimited JSON stream (Ollama)."""
+    async for raw in resp.content:
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            log("debug", "[LLM-STREAM] Skipping malformed NDJSON line: %r", line[:120])
+
+
+async def _iter_sse(resp: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+    """Yield the parsed JSON payload of every ``data:`` line of a server-sent-events stream."""
+    async for raw in resp.content:
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            continue
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            log("debug", "[LLM-STREAM] Skipping malformed SSE payload: %r", data[:120])
+
+
+async def _stream_deltas(
+    target: dict,
+    messages: list[dict],
+    session: aiohttp.ClientSession,
+    images: list[tuple[str, str]] | None = None,
+) -> AsyncIterator[str]:
+    """Yield text fragments from *target*'s streaming endpoint as they arrive."""
+    provider = target["provider"]
+    if provider == "ollama":
+        request = _ollama_request(target, messages, images, stream=True)
+    elif provider == "ollama_cloud":
+        request = _ollama_cloud_request(target, messages, images, stream=True)
+    elif provider == "anthropic":
+        request = _anthropic_request(target, messages, images, stream=True)
+    elif provider == "gemini":
+        request = _gemini_request(target, messages, images, stream=True)
+    else:
+        request = _openai_compat_request(target, messages, images, stream=True)
+    if request is None:
+        return
+    url, headers, payload = request
+
+    async with session.post(url, json=payload, headers=headers, timeout=_llm_timeout(target)) as resp:
+        if resp.status != 200:
+            print(f"❌ {provider} stream returned HTTP {resp.status}: {await resp.text()}")
+            return
+
+        if provider in ("ollama", "ollama_cloud"):
+            async for chunk in _iter_ndjson(resp):
+                text = chunk.get("message", {}).get("content", "")
+                if text:
+                    yield text
+                if chunk.get("done"):
+                    _log_usage(target, chunk)
+                    break
+
+        elif provider == "anthropic":
+            async for event in _iter_sse(resp):
+                if event.get("type") == "message_start":
+                    _log_usage(target, event.get("message") or {})
+                elif event.get("type") == "content_block_delta":
+                    text = event.get("delta", {}).get("text", "")
+                    if text:
+                        yield text
+                elif event.get("type") == "message_stop":
+                    break
+
+        elif provider == "gemini":
+            usage_event = None
+            async for event in _iter_sse(resp):
+                if "usageMetadata" in event:
+                    usage_event = event
+                for candidate in event.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+            if usage_event:
+                _log_usage(target, usage_event)
+
+        else:
+            async for event in _iter_sse(resp):
+                if event.get("usage"):
+                    _log_usage(target, event)
+                for choice in event.get("choices", [])[:1]:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield text
+
+
+async def _collect_stream(
+    target: dict,
+    messages: list[dict],
+    session: aiohttp.ClientSession,
+    images: list[tuple[str, str]] | None,
+    on_stream: Callable[[str], Awaitable[None]],
+) -> str | None:
+    """Drain a provider stream, awaiting *on_stream* with the text so far after each chunk."""
+    text = ""
+    try:
+        async for delta in _stream_deltas(target, messages, session, images):
+            text += delta
+            await on_stream(text)
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        if not text:
+            raise
+        # Part of the reply is already visible in chat - keep it rather than falling back.
+        print(f"⚠️  LLM stream interrupted after {len(text)} chars: {e}")
+        log("warning", f"[LLM-STREAM] Interrupted after {len(text)} chars: {e}")
+    return text.strip() or None
+
+
+# ------------------------------------------------------------
+# Provider chain: failover, circuit breakers, hedging
+# ------------------------------------------------------------
+
+def llm_targets() -> list[dict]:
+    """
+    Return the provider chain: LLM_PROVIDER first, then LLM_PROVIDER_CHAIN entries.
+
+    Each entry is a dict with provider, model, base_url, api_key, timeout and
+    name ("provider:model"). Per-provider LLM_API_KEY_<P> / LLM_BASE_URL_<P> /
+    LLM_TIMEOUT_<P> settings win; LLM_API_KEY / LLM_BASE_URL only apply to
+    entries that use the same provider as LLM_PROVIDER.
+    """
+    primary = cfg.get("LLM_PROVIDER", "ollama").lower()
+    entries = [(primary, cfg["LLM_MODEL"])]
+    for entry in cfg.get("LLM_PROVIDER_CHAIN", "").split(","):
+        provider, _, model = entry.strip().partition(":")
+        if provider:
+            entries.append((provider.strip().lower(), model.strip() or cfg["LLM_MODEL"]))
+
+    targets, seen = [], set()
+    for provider, model in entries:
+        name = f"{provider}:{model}"
+        if name in seen:
+            continue
+        seen.add(name)
+        suffix = provider.upper()
+        same = provider == primary
+        targets.append({
+            "name":     name,
+            "provider": provider,
+            "model":    model,
+            "base_url": cfg.get(f"LLM_BASE_URL_{suffix}")
+                        or (cfg["LLM_BASE_URL"] if same else LLM_PROVIDER_DEFAULT_URLS.get(provider, "")),
+            "api_key":  (cfg.get(f"LLM_API_KEY_{suffix}") or (cfg.get("LLM_API_KEY", "") if same else "")).strip(),
+            "timeout":  cfg.get(f"LLM_TIMEOUT_{suffix}") or cfg["LLM_TIMEOUT"],
+        })
+    return targets
+
+
+class ProviderHealth:
+    """Circuit breaker and recent reply times for one provider chain entry."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0               # consecutive failures
+        self.open_until = 0.0           # monotonic time the cooldown ends (0 = breaker closed)
+        self.probing = False            # half-open: a trial request is in flight
+        self.latencies: deque[float] = deque(maxlen=50)
+
+    def available(self) -> bool:
+        """False while cooling down, or while another request is probing a half-open breaker."""
+        return time.monotonic() >= self.open_until and not self.probing
+
+    def acquire(self) -> bool:
+        """Claim the right to send one request.
+
+        Once the cooldown has passed the breaker is half-open: the first caller
+        becomes the probe and everyone else keeps skipping this provider until
+        the probe's outcome is recorded.
+        """
+        if not self.available():
+            return False
+        if self.open_until:
+            self.probing = True
+        return True
+
+    def release_probe(self):
+        """Give up a probe without an outcome (e.g. the request was cancelled)."""
+        self.probing = False
+
+    def record_success(self, seconds: float):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.latencies.append(seconds)
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        threshold = cfg["LLM_BREAKER_FAILURES"]
+        if threshold and self.failures >= threshold:
+            # A failed half-open probe lands here too and reopens the breaker.
+            cooldown = cfg["LLM_BREAKER_COOLDOWN_SECONDS"]
+            self.open_until = time.monotonic() + cooldown
+            print(f"⛔ LLM provider {self.name} failed {self.failures}x in a row - skipping it for {cooldown}s")
+            log("warning", f"[LLM-CHAIN] Breaker open for {self.name} after {self.failures} failures")
+
+    def p90(self) -> float | None:
+        """90th-percentile reply time in seconds, or None until there are enough samples."""
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def describe(self) -> str:
+        if self.probing:
+            return "🔁 probing"
+        if not self.available():
+            return f"⛔ cooling down ({int(self.open_until - time.monotonic())}s)"
+        p90 = self.p90()
+        return f"✅ p90 {p90:.1f}s" if p90 is not None else "✅"
+
+
+_provider_health: dict[str, ProviderHealth] = {}
+
+
+def provider_health(target: dict) -> ProviderHealth:
+    health = _provider_health.get(target["name"])
+    if health is None:
+        health = _provider_health[target["name"]] = ProviderHealth(target["name"])
+    return health
+
+
+async def _query_target(
+    target: dict,
+    messages: list[dict],
+    images: list[tuple[str, str]] | None,
+    on_stream: Callable[[str], Awaitable[None]] | None = None,
+) -> str | None:
+    """Query one provider chain entry and record the outcome in its circuit breaker."""
+    provider = target["provider"]
+    health = provider_health(target)
+    if not health.acquire():
+        # Breaker opened, or another request is already probing it, since the chain was built.
+        return None
+    # The vision helpers rewrite the last user message in place - keep each attempt separate.
+    messages = [dict(m) for m in messages]
+    started = time.monotonic()
+    reply = None
+    error = None
+    usage: dict = {}
+    usage_token = _llm_call_usage.set(usage)
+    streaming = on_stream is not None and provider in STREAMING_PROVIDERS
+    event("llm_request_start", target=target["name"], provider=provider, model=target["model"],
+          images=len(images or ()), stream=streaming)
+
+    try:
+        session = get_http_session()
+
+        if streaming:
+            reply = await _collect_stream(target, messages, session, images, on_stream)
+
+        elif provider == "ollama":
+            reply = await _query_ollama(target, messages, session, images)
+
+        elif provider == "ollama_cloud":
+            reply = await _query_ollama_cloud(target, messages, session, images)
+
+        elif provider == "anthropic":
+            reply = await _query_anthropic(target, messages, session, images)
+
+        elif provider == "gemini":
+            reply = await _query_gemini(target, messages, session, images)
+
+        elif provider in ("openai", "lmstudio", "groq", "openrouter", "openai_compat"):
+            reply = await _query_openai_compat(target, messages, session, images)
+
+        elif provider == "openmodel":
+            reply = await _query_openmodel(target, messages, session, images)
+
+        else:
+            print(f"❌ Unknown LLM provider '{provider}'.")
+
+    except asyncio.TimeoutError:
+        error = "timeout"
+        print(f"❌ LLM request to {target['name']} timed out after {target['timeout']}s")
+    except aiohttp.ClientConnectorError as e:
+        error = "connect"
+        print(f"❌ Cannot connect to LLM at {target['base_url']} - is it running? ({e})")
+    except asyncio.CancelledError:
+        health.release_probe()
+        event("llm_request_end", target=target["name"], provider=provider, model=target["model"],
+              dur_ms=ms_since(started), ok=False, error="cancelled", **usage)
+        raise
+    except Exception as e:
+        error = type(e).__name__
+        print(f"❌ LLM error ({target['name']}): {e}")
+    finally:
+        _llm_call_usage.reset(usage_token)
+
+    event("llm_request_end", target=target["name"], provider=provider, model=target["model"],
+          dur_ms=ms_since(started), ok=bool(reply), error=error,
+          reply_chars=len(reply) if reply else 0, **usage)
+    if reply:
+        health.record_success(time.monotonic() - started)
+    else:
+        health.record_failure()
+    return reply
+
+
+def _hedge_delay(target: dict) -> float:
+    """Seconds to wait for *target* before also asking the next provider."""
+    if cfg["LLM_HEDGE_DELAY_MS"] > 0:
+        return cfg["LLM_HEDGE_DELAY_MS"] / 1000
+    p90 = provider_health(target).p90()
+    return p90 if p90 is not None else min(3.0, target["timeout"])
+
+
+async def _query_chain(
+    messages: list[dict],
+    images: list[tuple[str, str]] | None,
+    on_stream: Callable[[str], Awaitable[None]] | None,
+) -> str | None:
+    """
+    Ask the provider chain for a reply, skipping entries whose breaker is open.
+
+    Without hedging (or while streaming) entries are tried one after another.
+    With ENABLE_LLM_HEDGING the next entry is also started once the current
+    one has been silent for _hedge_delay(); the first non-empty reply wins and
+    the other requests are cancelled.
+    """
+    targets = [t for t in llm_targets() if provider_health(t).available()]
+    if not targets:
+        print("⚠️  All LLM providers are cooling down after repeated failures.")
+        event("llm_unavailable", reason="breakers_open")
+        return None
+
+    if on_stream is not None or not cfg.get("ENABLE_LLM_HEDGING") or len(targets) < 2:
+        for i, target in enumerate(targets):
+            if i:
+                log("info", f"[LLM-CHAIN] Falling back to {target['name']}")
+                event("llm_fallback", target=target["name"], reason="failover")
+            reply = await _query_target(target, messages, images, on_stream)
+            if reply:
+                return reply
+        return None
+
+    waiting = list(targets)
+    running: set[asyncio.Task] = set()
+
+    def launch():
+        target = waiting.pop(0)
+        if target is not targets[0]:
+            log("info", f"[LLM-CHAIN] Also asking {target['name']}")
+            event("llm_fallback", target=target["name"], reason="hedge")
+        running.add(asyncio.create_task(_query_target(target, messages, images)))
+
+    launch()
+    try:
+        while running:
+            delay = _hedge_delay(targets[0]) if waiting else None
+            done, running = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                reply = task.result()
+                if reply:
+                    return reply
+            # Hedge when the slow request is still pending, fail over when nothing is left running.
+            if waiting and (not done or not running):
+                launch()
+        return None
+    finally:
+        for task in running:
+            task.cancel()
+
+
+# ------------------------------------------------------------
+# Scheduler
+# ------------------------------------------------------------
+
+# Request priorities (lower is served first)
+LLM_PRIORITY_MENTION    = 0   # direct @mentions
+LLM_PRIORITY_WINDOW     = 1   # attention-window replies
+LLM_PRIORITY_GREETING   = 2   # welcome messages
+LLM_PRIORITY_BACKGROUND = 3   # shitposts and other unprompted posts
+
+
+class LLMScheduler:
+    """
+    Bounds how many LLM requests run at once and orders the ones that wait.
+
+    Waiting requests are ordered by (priority, user load, arrival), where user
+    load is how many requests that user already has queued or running - so a
+    spammer's fifth message waits behind everyone else's first. When the queue
+    is full the least important waiting request is shed (acquire returns False)
+    and the caller falls back to a canned reply.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, per_user: int, queue_timeout: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.per_user = max(1, per_user)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.shed = 0
+        self._queue: list[tuple[int, int, int, int | None, asyncio.Future]] = []   # heap
+        self._seq = 0
+        self._user_load: dict[int, int] = {}    # user_id → requests queued or running
+        self._user_waiting: dict[int, int] = {} # user_id → requests queued
+
+    def _bump(self, table: dict[int, int], user_id: int | None, delta: int):
+        if user_id is None:
+            return
+        value = table.get(user_id, 0) + delta
+        if value > 0:
+            table[user_id] = value
+        else:
+            table.pop(user_id, None)
+
+    def _drop(self, entry: tuple):
+        """Remove a waiting entry (shed, timed out or cancelled)."""
+        try:
+            self._queue.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._queue)
+        self._bump(self._user_waiting, entry[3], -1)
+        self._bump(self._user_load, entry[3], -1)
+
+    async def acquire(self, priority: int, user_id: int | None = None) -> bool:
+        """Wait for a slot. Returns False if the request was shed instead."""
+        if self.active < self.max_concurrent and not self._queue:
+            self.active += 1
+            self._bump(self._user_load, user_id, 1)
+            return True
+
+        if user_id is not None and self._user_waiting.get(user_id, 0) >= self.per_user:
+            self.shed += 1
+            return False
+
+        rank = self._user_load.get(user_id, 0) if user_id is not None else 0
+        self._seq += 1
+        entry = (priority, rank, self._seq, user_id, asyncio.get_running_loop().create_future())
+
+        if len(self._queue) >= self.max_queue:
+            worst = max(self._queue, default=None, key=lambda e: e[:3])
+            if worst is None or worst[:3] < entry[:3]:
+                self.shed += 1
+                return False
+            self._drop(worst)
+            worst[4].set_result(False)
+            self.shed += 1
+
+        heapq.heappush(self._queue, entry)
+        self._bump(self._user_waiting, user_id, 1)
+        self._bump(self._user_load, user_id, 1)
+        try:
+            return await asyncio.wait_for(entry[4], self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            # On 3.12+ wait_for can time out after release() already handed us
+            # the slot (or a newer request already shed us) - keep that outcome.
+            if entry[4].done() and not entry[4].cancelled():
+                return entry[4].result()
+            self._drop(entry)
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if entry[4].done() and not entry[4].cancelled() and entry[4].result():
+                self.release(user_id)
+            else:
+                self._drop(entry)
+            raise
+
+    def release(self, user_id: int | None = None):
+        self.active -= 1
+        self._bump(self._user_load, user_id, -1)
+        while self.active < self.max_concurrent and self._queue:
+            entry = heapq.heappop(self._queue)
+            self._bump(self._user_waiting, entry[3], -1)
+            if entry[4].done():
+                self._bump(self._user_load, entry[3], -1)
+                continue
+            self.active += 1
+            entry[4].set_result(True)
+
+    def stats(self) -> str:
+        return f"{self.active}/{self.max_concurrent} running, {len(self._queue)} queued, {self.shed} shed"
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrent=cfg["LLM_MAX_CONCURRENT"],
+    max_queue=cfg["LLM_QUEUE_MAX"],
+    per_user=cfg["LLM_QUEUE_PER_USER"],
+    queue_timeout=cfg["LLM_QUEUE_TIMEOUT_SECONDS"],
+)
+
+
+class LLMResponseCache:
+    """
+    TTL + LRU cache of LLM replies keyed on everything that shapes the answer.
+
+    The context fingerprint only covers the last few messages from *other*
+    people: the bot's own replies and repeats of the same prompt are skipped,
+    so someone spamming "@Bruh meow" keeps hitting the same entry.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, context_messages: int):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.context_messages = max(0, context_messages)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()  # key → (expires, reply)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.split()).casefold()
+
+    def key(self, provider: str, model: str, system_prompt: str, history: list[dict], prompt: str) -> str:
+        prompt_n = self._normalize(prompt)
+        context: list[str] = []
+        if self.context_messages:
+            for entry in reversed(history):
+                if entry["role"] != "user":
+                    continue
+                content = self._normalize(entry["content"])
+                if content.partition("]: ")[2] == prompt_n:
+                    continue
+                context.append(content)
+                if len(context) >= self.context_messages:
+                    break
+        parts = [provider, model, self._normalize(system_prompt), *reversed(context), prompt_n]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, reply: str):
+        self._entries[key] = (time.monotonic() + self.ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        rate = f"{self.hits / lookups:.0%}" if lookups else "n/a"
+        return f"{len(self._entries)} cached, {self.hits} hits / {self.misses} misses ({rate})"
+
+
+llm_cache = LLMResponseCache(
+    ttl=cfg["LLM_CACHE_TTL_SECONDS"],
+    max_entries=cfg["LLM_CACHE_MAX_ENTRIES"],
+    context_messages=cfg["LLM_CACHE_CONTEXT_MESSAGES"],
+)
+
+
 async def query_llm(
     prompt: str,
     user_identity: str,
@@ -1885,55 +4297,99 @@ async def query_llm(
     extra_system_prompt: str = "",
     channel_name: str = "",
     images: list[tuple[str, str]] | None = None,
+    on_stream: Callable[[str], Awaitable[None]] | None = None,
+    use_cache: bool = True,
+    priority: int = LLM_PRIORITY_MENTION,
+    user_id: int | None = None,
+    system_prompt: str | None = None,
+    summary: str = "",
 ) -> str | None:
-    provider = cfg.get("LLM_PROVIDER", "ollama").lower()
-    messages = _build_messages(prompt, user_identity, history, extra_system_prompt, channel_name)
+    """Send a prompt to the provider chain (see _query_chain) and return the reply text (or None).
 
-    try:
-        timeout = aiohttp.ClientTimeout(total=cfg["LLM_TIMEOUT"])
-        async with aiohttp.ClientSession(timeout=timeout) as session:
+    If *on_stream* is given and LLM_STREAMING is on, providers that support it
+    are queried in streaming mode and *on_stream* is awaited with the
+    accumulated text after every chunk. The complete text is still returned.
 
-            if provider == "ollama":
-                return await _query_ollama(messages, session, images)
+    With ENABLE_LLM_CACHE on, identical requests are answered from llm_cache
+    (never for prompts with images, or when *use_cache* is False). A cache hit
+    does not call *on_stream*.
 
-            elif provider == "ollama_cloud":
-                return await _query_ollama_cloud(messages, session, images)
+    Provider calls wait for a slot in llm_scheduler by *priority* and
+    *user_id*; if the request is shed under load, None is returned.
+
+    *system_prompt* replaces LLM_SYSTEM_PROMPT for this call; *summary* is a
+    rolling channel summary placed right after it.
+    """
+    provider = cfg.get("LLM_PROVIDER", "ollama").lower()
+    messages = _build_messages(
+        prompt, user_identity, history, extra_system_prompt, channel_name, system_prompt, summary
+    )
 
-            elif provider == "anthropic":
-                return await _query_anthropic(messages, session, images)
+    cache_key = None
+    if use_cache and cfg.get("ENABLE_LLM_CACHE") and not images:
+        # System prompt plus the final user turn, which carries the per-request
+        # facts when LLM_STABLE_PROMPT_PREFIX is on.
+        cache_key = llm_cache.key(
+            provider, cfg["LLM_MODEL"], f"{messages[0]['content']}\n{messages[-1]['content']}", history, prompt
+        )
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            log("debug", "[LLM-CACHE] Hit for %r", prompt[:60])
+            event("llm_cache_hit", reply_chars=len(cached))
+            return cached
+
+    if not cfg.get("LLM_STREAMING"):
+        on_stream = None
+    queued = time.monotonic()
+    admitted = await llm_scheduler.acquire(priority, user_id)
+    event("llm_queue_wait", dur_ms=ms_since(queued), priority=priority, admitted=admitted)
+    if not admitted:
+        print(f"⚠️  LLM queue full - dropped request from {user_identity} ({llm_scheduler.stats()})")
+        log("warning", f"[LLM-QUEUE] Shed request from {user_identity} | {llm_scheduler.stats()}")
+        return None
+    try:
+        reply = await _query_chain(messages, images, on_stream)
+    finally:
+        llm_scheduler.release(user_id)
+    if cache_key and reply:
+        llm_cache.put(cache_key, reply)
+    return reply
 
-            elif provider == "gemini":
-                return await _query_gemini(messages, session, images)
 
-            elif provider in ("openai", "lmstudio", "groq", "openrouter", "openai_compat"):
-                return await _query_openai_compat(
-                    messages, session,
-                    base_url=cfg["LLM_BASE_URL"],
-                    api_key=cfg.get("LLM_API_KEY", ""),
-                    images=images,
-                )
+# ============================================================
+# DEMOTIVATOR HELPER
+# ============================================================
 
-            elif provider == "openmodel":
-                return await _query_openmodel(messages, session, images)
+_SERIF_BOLD = (
+    "/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf",
+)
+_SERIF_REG = (
+    "/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
+)
 
-            else:
-                print(f"❌ Unknown LLM_PROVIDER '{provider}'.")
-                return None
 
-    except asyncio.TimeoutError:
-        print(f"❌ LLM request timed out after {cfg['LLM_TIMEOUT']}s")
-        return None
-    except aiohttp.ClientConnectorError as e:
-        print(f"❌ Cannot connect to LLM at {cfg['LLM_BASE_URL']} - is it running? ({e})")
-        return None
-    except Exception as e:
-        print(f"❌ LLM error ({provider}): {e}")
-        return None
+@functools.lru_cache(maxsize=None)
+def _load_font(paths: tuple[str, ...], size: int):
+    """Return the first loadable font in *paths* at *size* (loaded once, then cached)."""
+    for p in paths:
+        try:
+            return ImageFont.truetype(p, size)
+        except OSError:
+            pass
+    return ImageFont.load_default(size=size)
 
 
-# ============================================================
-# DEMOTIVATOR HELPER
-# ============================================================
+@functools.lru_cache(maxsize=4096)
+def _text_width(font, text: str) -> float:
+    """Memoised rendered width of *text* in *font*."""
+    return font.getlength(text)
+
+
+def _demotivator_extension() -> str:
+    return "webp" if cfg["DEMOTIVATOR_FORMAT"].lower() == "webp" else "png"
+
 
 def _build_demotivator(photo: Image.Image, title: str, subtitle: str = "") -> bytes:
     """
@@ -1949,25 +4405,8 @@ def _build_demotivator(photo: Image.Image, title: str, subtitle: str = "") -> by
     PAD    = 40   # outer padding on all sides
 
     # ── fonts ────────────────────────────────────────────────
-    SERIF_BOLD = [
-        "/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf",
-    ]
-    SERIF_REG = [
-        "/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
-    ]
-
-    def _font(paths, size):
-        for p in paths:
-            try:
-                return ImageFont.truetype(p, size)
-            except OSError:
-                pass
-        return ImageFont.load_default(size=size)
-
-    title_font = _font(SERIF_BOLD, 48)
-    sub_font   = _font(SERIF_REG,  24)
+    title_font = _load_font(_SERIF_BOLD, 48)
+    sub_font   = _load_font(_SERIF_REG,  24)
 
     # ── scale photo so it fits within 600 px wide ────────────
     max_w = 600
@@ -1982,21 +4421,22 @@ def _build_demotivator(photo: Image.Image, title: str, subtitle: str = "") -> by
     inner_w = W - PAD * 2
 
     # ── measure / wrap text ──────────────────────────────────
-    dummy = Image.new("RGB", (1, 1))
-    d     = ImageDraw.Draw(dummy)
-
     def wrap(text: str, font) -> list[str]:
-        lines, line = [], ""
+        # Line width is summed from cached per-word widths instead of
+        # re-measuring the whole line for every word added.
+        space_w = _text_width(font, " ")
+        lines, line, line_w = [], [], 0.0
         for word in text.split():
-            test = (line + " " + word).strip()
-            if d.textlength(test, font=font) <= inner_w:
-                line = test
+            word_w = _text_width(font, word)
+            test_w = line_w + space_w + word_w if line else word_w
+            if test_w <= inner_w or not line:
+                line.append(word)
+                line_w = test_w
             else:
-                if line:
-                    lines.append(line)
-                line = word
+                lines.append(" ".join(line))
+                line, line_w = [word], word_w
         if line:
-            lines.append(line)
+            lines.append(" ".join(line))
         return lines
 
     title_lines = wrap(title.upper(), title_font)
@@ -2030,7 +4470,7 @@ def _build_demotivator(photo: Image.Image, title: str, subtitle: str = "") -> by
     # title
     y = PAD + photo.height + BORDER + 20
     for line in title_lines:
-        tw = d.textlength(line, font=title_font)
+        tw = _text_width(title_font, line)
         draw.text(((W - tw) / 2, y), line, font=title_font, fill="white")
         y += LH_TITLE
 
@@ -2038,15 +4478,168 @@ def _build_demotivator(photo: Image.Image, title: str, subtitle: str = "") -> by
     if sub_lines:
         y += 10
         for line in sub_lines:
-            tw = d.textlength(line, font=sub_font)
+            tw = _text_width(sub_font, line)
             draw.text(((W - tw) / 2, y), line, font=sub_font, fill=(180, 180, 180))
             y += LH_SUB
 
     buf = io.BytesIO()
-    canvas.save(buf, format="PNG")
+    if _demotivator_extension() == "webp":
+        canvas.save(buf, format="WEBP", quality=cfg["DEMOTIVATOR_WEBP_QUALITY"], method=4)
+    else:
+        canvas.save(buf, format="PNG", compress_level=cfg["DEMOTIVATOR_PNG_COMPRESS_LEVEL"])
     return buf.getvalue()
 
 
+# Poster rendering runs on worker threads: Pillow releases the GIL while
+# resizing and encoding, so the event loop keeps serving the gateway.
+_demotivator_executor = ThreadPoolExecutor(
+    max_workers=max(1, cfg["DEMOTIVATOR_WORKERS"]),
+    thread_name_prefix="demotivator",
+)
+_demotivator_pending = 0                       # rendering + waiting
+_demotivator_per_user: dict[int, int] = {}     # user_id → posters in progress
+
+
+def _check_image_dimensions(img_bytes: bytes) -> str | None:
+    """Read only the image header and return an error message if it is unusable."""
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as img:
+            width, height = img.size
+    except Exception:
+        return "❌ Couldn't read that image."
+    if width * height > cfg["DEMOTIVATOR_MAX_PIXELS"]:
+        return f"❌ That image is too big ({width}×{height}). Try a smaller one."
+    return None
+
+
+def _render_demotivator(img_bytes: bytes, title: str, subtitle: str) -> bytes:
+    """Decode *img_bytes* and build the poster (runs in _demotivator_executor)."""
+    with Image.open(io.BytesIO(img_bytes)) as photo:
+        return _build_demotivator(photo, title, subtitle)
+
+
+# ============================================================
+# HOT RELOAD
+# ============================================================
+
+class FileWatcher:
+    """
+    Calls an async handler when a watched file, or a .txt file inside a
+    watched folder, changes.
+
+    Uses watchfiles (inotify / FSEvents / ReadDirectoryChangesW) when it is
+    installed and falls back to polling modification times otherwise. Stat
+    calls and reloads run off the event loop.
+    """
+
+    def __init__(self, poll_seconds: int):
+        self.poll_seconds = max(1, poll_seconds)
+        self._files: dict[pathlib.Path, Callable[[pathlib.Path], Awaitable[None]]] = {}
+        self._folders: dict[pathlib.Path, Callable[[pathlib.Path], Awaitable[None]]] = {}
+        self._task: asyncio.Task | None = None
+
+    def watch_file(self, path: pathlib.Path, handler: Callable[[pathlib.Path], Awaitable[None]]):
+        self._files[path.resolve()] = handler
+
+    def watch_folder(self, path: pathlib.Path, handler: Callable[[pathlib.Path], Awaitable[None]]):
+        self._folders[path.resolve()] = handler
+
+    def _handler(self, path: pathlib.Path):
+        if path in self._files:
+            return self._files[path]
+        if path.suffix == ".txt":
+            return self._folders.get(path.parent)
+        return None
+
+    async def _dispatch(self, changed: set[pathlib.Path]):
+        for path in sorted(changed):
+            handler = self._handler(path)
+            if handler is None:
+                continue
+            try:
+                await handler(path)
+                log("info", f"[RELOAD] Reloaded {path.name}")
+            except Exception as e:
+                print(f"⚠️  Hot reload of {path.name} failed: {e}")
+                log("warning", f"[RELOAD] {path}: {e}")
+
+    def _snapshot(self) -> dict[pathlib.Path, tuple[int, int]]:
+        stamps = {}
+        candidates = list(self._files)
+        for folder in self._folders:
+            if folder.is_dir():
+                candidates.extend(folder.glob("*.txt"))
+        for path in candidates:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            stamps[path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    async def _run_polling(self):
+        previous = await asyncio.to_thread(self._snapshot)
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            current = await asyncio.to_thread(self._snapshot)
+            changed = {p for p in previous.keys() | current.keys() if previous.get(p) != current.get(p)}
+            previous = current
+            if changed:
+                await self._dispatch(changed)
+
+    async def _run_watchfiles(self):
+        roots = sorted({p.parent for p in self._files} | set(self._folders))
+        roots = [str(r) for r in roots if r.is_dir()]
+        async for changes in watchfiles.awatch(*roots, recursive=False):
+            await self._dispatch({pathlib.Path(p).resolve() for _, p in changes})
+
+    async def _run(self):
+        if watchfiles is not None:
+            try:
+                await self._run_watchfiles()
+                return
+            except Exception as e:
+                log("warning", f"[RELOAD] watchfiles failed ({e}), falling back to polling")
+        await self._run_polling()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+file_watcher = FileWatcher(cfg["HOT_RELOAD_POLL_SECONDS"])
+
+
+async def _reload_msgs_file(path: pathlib.Path):
+    if not path.exists():
+        return   # mid-save or deleted - keep what we have
+    for list_type, key in (("default", "DEFAULT_MSGS_FILE"), ("mention", "MENTION_MSGS_FILE")):
+        if path == (BOT_DIR / cfg[key]).resolve():
+            await msgs.reload(list_type)
+
+
+async def _reload_system_prompt(path: pathlib.Path):
+    cfg["LLM_SYSTEM_PROMPT"] = await asyncio.to_thread(load_system_prompt)
+
+
+def start_file_watcher():
+    """Register the hot-reloadable files and start watching them."""
+    if not cfg.get("ENABLE_HOT_RELOAD"):
+        return
+    file_watcher.watch_file(BOT_DIR / cfg["DEFAULT_MSGS_FILE"], _reload_msgs_file)
+    file_watcher.watch_file(BOT_DIR / cfg["MENTION_MSGS_FILE"], _reload_msgs_file)
+    file_watcher.watch_file(BOT_DIR / PROMPT_FILE, _reload_system_prompt)
+    file_watcher.watch_folder(prefix_commands.folder, prefix_commands.reload_file)
+    file_watcher.start()
+    mode = "file notifications" if watchfiles is not None else f"polling every {file_watcher.poll_seconds}s"
+    log("info", f"[RELOAD] Watching message files, {PROMPT_FILE} and {cfg['COMMANDS_FOLDER']}/ ({mode})")
+
+
 # ============================================================
 # BOT SETUP
 # ============================================================
@@ -2056,7 +4649,22 @@ intents.message_content = True
 intents.members = True
 intents.voice_states = True
 
-bot = commands.Bot(command_prefix=cfg["COMMAND_PREFIX"], intents=intents)
+class BruhBot(commands.Bot):
+    """commands.Bot with startup/shutdown hooks for shared resources."""
+
+    async def setup_hook(self):
+        get_http_session()
+        start_file_watcher()
+
+    async def close(self):
+        try:
+            file_watcher.stop()
+            await super().close()
+        finally:
+            await close_http_session()
+
+
+bot = BruhBot(command_prefix=cfg["COMMAND_PREFIX"], intents=intents)
 
 # Tracks recent joins for chicken-out detection: {member_id: join_timestamp}
 recent_joins: dict[int, discord.utils.datetime] = {}
@@ -2101,7 +4709,7 @@ class SuggestionView(discord.ui.View):
     async def accept_default(self, interaction: discord.Interaction, _: discord.ui.Button):
         if not await self._is_authorized(interaction):
             return
-        added = msgs.add(self.content, "default")
+        added = await msgs.add(self.content, "default")
         await interaction.response.send_message(
             "✅ Added to default list!" if added else "⚠️ Already in default list.", ephemeral=True
         )
@@ -2111,7 +4719,7 @@ class SuggestionView(discord.ui.View):
     async def accept_mention(self, interaction: discord.Interaction, _: discord.ui.Button):
         if not await self._is_authorized(interaction):
             return
-        added = msgs.add(self.content, "mention")
+        added = await msgs.add(self.content, "mention")
         await interaction.response.send_message(
             "✅ Added to mention list!" if added else "⚠️ Already in mention list.", ephemeral=True
         )
@@ -2121,8 +4729,8 @@ class SuggestionView(discord.ui.View):
     async def accept_both(self, interaction: discord.Interaction, _: discord.ui.Button):
         if not await self._is_authorized(interaction):
             return
-        d = msgs.add(self.content, "default")
-        m = msgs.add(self.content, "mention")
+        d = await msgs.add(self.content, "default")
+        m = await msgs.add(self.content, "mention")
         if d and m:
             note = "✅ Added to both lists!"
         elif not d and not m:
@@ -2319,12 +4927,16 @@ async def shitpost_loop():
                         shitpost_trigger, "Bruh", history,
                         extra_system_prompt=extra_prompt,
                         channel_name=channel_name,
+                        use_cache=False,
+                        priority=LLM_PRIORITY_BACKGROUND,
                     )
             else:
                 text = await query_llm(
                     shitpost_trigger, "Bruh", history,
                     extra_system_prompt=extra_prompt,
                     channel_name=channel_name,
+                    use_cache=False,
+                    priority=LLM_PRIORITY_BACKGROUND,
                 )
 
             if not text:
@@ -2363,12 +4975,12 @@ async def heartbeat_loop():
     if not url:
         return
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                if resp.status < 300:
-                    log("info", f"[HEARTBEAT] Pinged {url} → {resp.status}")
-                else:
-                    print(f"⚠️  Heartbeat ping returned HTTP {resp.status}")
+        session = get_http_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            if resp.status < 300:
+                log("info", f"[HEARTBEAT] Pinged {url} → {resp.status}")
+            else:
+                print(f"⚠️  Heartbeat ping returned HTTP {resp.status}")
     except Exception as e:
         print(f"⚠️  Heartbeat ping failed: {e}")
 
@@ -2417,6 +5029,139 @@ async def before_birthday_check_loop():
     await bot.wait_until_ready()
 
 
+# ============================================================
+# CHANNEL SUMMARY LOOP
+# ============================================================
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a Discord group chat for a chat bot called Bruh. "
+    "Write plain, neutral notes: who said what, topics, decisions, running jokes and anything "
+    "people asked Bruh to remember. Keep names. No commentary, no roleplay. Max 120 words."
+)
+
+
+# Channels with a summary request in flight, and when a channel may next be
+# summarized early because its buffer is filling up (see summarize_if_pressured)
+_summarizing: set[int] = set()
+_summary_pressure_after: dict[int, float] = {}
+_summary_tasks: set[asyncio.Task] = set()
+SUMMARY_PRESSURE_RETRY_SECONDS = 30
+# Channels where the bot has been talked to this session (see mark_summary_channel)
+_summary_channels: set[int] = set()
+
+
+def mark_summary_channel(channel_id: int):
+    """Opt *channel_id* into rolling summaries - called when the bot is addressed there."""
+    _summary_channels.add(channel_id)
+
+
+def wants_summary(channel_id: int) -> bool:
+    """Only channels the bot takes part in are worth background LLM calls.
+
+    A stored summary counts too, so channels stay covered across restarts.
+    """
+    return channel_id in _summary_channels or summaries.get(channel_id) is not None
+
+
+async def summarize_channel(channel_id: int, min_new: int | None = None) -> bool:
+    """Fold messages older than the raw tail into the channel's summary. Returns True if updated.
+
+    *min_new* overrides LLM_SUMMARY_MIN_NEW_MESSAGES (used when the buffer is
+    about to drop unsummarized messages).
+    """
+    if channel_id in _summarizing:
+        return False
+    _summarizing.add(channel_id)
+    try:
+        return await _summarize_channel(channel_id, min_new)
+    finally:
+        _summarizing.discard(channel_id)
+
+
+async def _summarize_channel(channel_id: int, min_new: int | None) -> bool:
+    tail = max(1, cfg["LLM_SUMMARY_TAIL_MESSAGES"])
+    entry = summaries.get(channel_id) or {"summary": "", "last_message_id": 0}
+    buffered = [m for m in history_cache.buffered(channel_id) if m.content]
+    new = [m for m in buffered[:-tail] if m.id > entry["last_message_id"]]
+    if min_new is None:
+        min_new = cfg["LLM_SUMMARY_MIN_NEW_MESSAGES"]
+    if len(new) < max(1, min_new):
+        return False
+
+    guild = new[-1].guild
+    max_tokens = cfg.get("LLM_CONTEXT_MESSAGE_MAX_TOKENS", 0)
+    lines = "\n".join(
+        f"[{member_display_name(m.author)}]: "
+        f"{truncate_to_tokens(resolve_message_content(m, guild), max_tokens)}"
+        for m in new
+    )
+    prompt = (
+        (f"Current summary:\n{entry['summary']}\n\n" if entry["summary"] else "")
+        + f"New messages:\n{lines}\n\n"
+        + "Write the updated summary."
+    )
+    summary = await query_llm(
+        prompt, "SYSTEM", [],
+        channel_name=getattr(new[-1].channel, "name", ""),
+        use_cache=False,
+        priority=LLM_PRIORITY_BACKGROUND,
+        system_prompt=SUMMARY_SYSTEM_PROMPT,
+    )
+    if not summary:
+        return False
+    await summaries.set(channel_id, summary.strip(), new[-1].id)
+    log("info", f"[SUMMARY] Channel {channel_id}: folded {len(new)} message(s) into summary "
+                f"({approx_tokens(summary)} tokens)")
+    return True
+
+
+def summarize_if_pressured(channel_id: int):
+    """Summarize *channel_id* now if unsummarized messages are about to leave the buffer.
+
+    Called for every buffered message. Once everything outside the raw tail is
+    unsummarized, only the tail's worth of new messages remains before the
+    oldest of them is evicted, so a fold is started straight away instead of
+    waiting for summary_loop.
+    """
+    if not (cfg["ENABLE_LLM"] and cfg["ENABLE_LLM_SUMMARY"]) or channel_id in _summarizing:
+        return
+    if not wants_summary(channel_id):
+        return
+    now = time.monotonic()
+    if now < _summary_pressure_after.get(channel_id, 0):
+        return
+    last_id = (summaries.get(channel_id) or {}).get("last_message_id", 0)
+    threshold = max(1, history_cache.size - max(1, cfg["LLM_SUMMARY_TAIL_MESSAGES"]))
+    unsummarized = history_cache.count_newer(channel_id, last_id)
+    if unsummarized < threshold:
+        return
+    # Don't retry on every message while the LLM is failing or busy.
+    _summary_pressure_after[channel_id] = now + SUMMARY_PRESSURE_RETRY_SECONDS
+    log("debug", "[SUMMARY] Channel %s: %d unsummarized message(s), summarizing early", channel_id, unsummarized)
+    task = asyncio.create_task(summarize_channel(channel_id, min_new=1), name=f"summary-{channel_id}")
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+
+
+@tasks.loop(minutes=10)
+async def summary_loop():
+    """Periodically refresh the rolling summaries of recently active channels the bot talks in."""
+    if not (cfg["ENABLE_LLM"] and cfg["ENABLE_LLM_SUMMARY"]):
+        return
+    for channel_id in history_cache.channel_ids():
+        if not wants_summary(channel_id):
+            continue
+        try:
+            await summarize_channel(channel_id)
+        except Exception as e:
+            log("warning", f"[SUMMARY] Channel {channel_id} failed: {e}")
+
+
+@summary_loop.before_loop
+async def before_summary_loop():
+    await bot.wait_until_ready()
+
+
 # ============================================================
 # EVENTS
 # ============================================================
@@ -2431,12 +5176,20 @@ async def on_ready():
     print(f"   Context msgs      : last {cfg['LLM_CONTEXT_MESSAGES']} channel messages per response")
     print(f"   Attention window  : {'✅ ' + str(cfg['ATTENTION_WINDOW_SECONDS']) + 's | debounce ' + str(cfg['LLM_DEBOUNCE_SECONDS']) + 's' if cfg['ENABLE_ATTENTION_WINDOW'] else '❌ ping-only mode'}")
     print(f"   Logging           : {'✅ ' + cfg['LOG_DIR'] + '/' + cfg['LOG_FILE'] if cfg['ENABLE_LOGGING'] else '❌ disabled'}")
+    print(f"   Event log         : {'✅ ' + cfg['LOG_DIR'] + '/' + cfg['EVENT_LOG_FILE'] if cfg['ENABLE_EVENT_LOG'] else '❌ disabled'}")
     print(f"   Guild ID          : {cfg['GUILD_ID'] if cfg['GUILD_ID'] else '❌ not set (all commands global)'}")
 
     # ── Voice manager ─────────────────────────────────────────────────────────
     if cfg.get("ENABLE_VOICE"):
-        voice_manager = VoiceManager()
-        voice_manager.start_spontaneous_loop()
+        if voice_manager is None:
+            voice_manager = VoiceManager()
+            voice_manager.start_spontaneous_loop()
+        else:
+            # on_ready fires again after every reconnect - keep the manager (and its
+            # timers and voice clients) and only refresh the index from the new cache.
+            voice_manager.reindex_guilds()
+        if cfg.get("ENABLE_VOICE_OPUS_CACHE") and not sound_cache.enabled:
+            print("⚠️  ffmpeg not found on PATH - Opus sound cache disabled.")
         print(f"   Voice             : ✅ sounds={len(voice_manager.sounds)} | "
               f"interval={cfg['VOICE_SOUND_INTERVAL_BASE']}±{cfg['VOICE_SOUND_INTERVAL_VARIANCE']}s | "
               f"alone-timeout={cfg['VOICE_ALONE_DISCONNECT_SECONDS']}s")
@@ -2499,6 +5252,16 @@ async def on_ready():
     else:
         print(f"   Birthdays         : ❌ disabled")
 
+    # ── Channel summary loop ─────────────────────────────────────────────────
+    if cfg["ENABLE_LLM"] and cfg["ENABLE_LLM_SUMMARY"]:
+        interval = max(1, cfg["LLM_SUMMARY_INTERVAL_MINUTES"])
+        summary_loop.change_interval(minutes=interval)
+        if not summary_loop.is_running():
+            summary_loop.start()
+        print(f"   Channel summaries : ✅ every {interval} min | tail={cfg['LLM_SUMMARY_TAIL_MESSAGES']} msgs")
+    else:
+        print(f"   Channel summaries : ❌ disabled")
+
     # ── Greeting ──────────────────────────────────────────────────────────────
     if cfg["ENABLE_GREETING"]:
         gchan = cfg.get("GREETING_CHANNEL_ID", 0)
@@ -2510,6 +5273,8 @@ async def on_ready():
 
 @bot.event
 async def on_message(message: discord.Message):
+    history_cache.add(message)
+    summarize_if_pressured(message.channel.id)
     if message.author == bot.user:
         return
 
@@ -2562,11 +5327,10 @@ async def on_message(message: discord.Message):
     if message.content.startswith(prefix):
         command_name = message.content[len(prefix):].split()[0].lower() if message.content[len(prefix):].split() else ""
         if command_name:
-            commands_dir = BOT_DIR / cfg.get("COMMANDS_FOLDER", "commands")
-            command_file = commands_dir / f"{command_name}.txt"
-            if command_file.is_file():
+            command = prefix_commands.resolve(command_name)
+            if command is not None:
+                _, content = command
                 try:
-                    content = command_file.read_text(encoding="utf-8").strip()
                     if content:
                         await message.channel.send(content)
                         log("info", f"[CMD] #{getattr(message.channel, 'name', message.channel.id)} "
@@ -2648,7 +5412,7 @@ async def on_message(message: discord.Message):
                     # Ping-only mode: respond immediately, no debounce
                     if cfg["ENABLE_LLM"]:
                         if cfg["LLM_PERCENTAGE"] and random.randint(1, 100) > cfg["LLM_PERCENTAGE_VALUE"]:
-                            log("debug", f"[LLM] Skipped (percentage gate) for {user_identity}")
+                            log("debug", "[LLM] Skipped (percentage gate) for %s", user_identity)
                             if msgs.mention:
                                 fallback = random.choice(msgs.mention)
                                 try:
@@ -2657,7 +5421,7 @@ async def on_message(message: discord.Message):
                                 except discord.Forbidden:
                                     pass
                         else:
-                            await handle_llm_mention(message, mention_text, user_identity)
+                            await handle_llm_mention(message, mention_text, user_identity, source)
                     else:
                         if msgs.mention:
                             fallback = random.choice(msgs.mention)
@@ -2670,21 +5434,168 @@ async def on_message(message: discord.Message):
     await bot.process_commands(message)
 
 
-async def bot_reply(message: discord.Message, text: str) -> None:
+@bot.event
+async def on_message_edit(before: discord.Message, after: discord.Message):
+    history_cache.update(after)
+
+
+@bot.event
+async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
+    history_cache.remove(payload.channel_id, {payload.message_id})
+
+
+@bot.event
+async def on_raw_bulk_message_delete(payload: discord.RawBulkMessageDeleteEvent):
+    history_cache.remove(payload.channel_id, set(payload.message_ids))
+
+
+async def bot_reply(message: discord.Message, text: str) -> discord.Message:
     """Send *text* as a Discord reply to *message* if ENABLE_REPLY_TO_MESSAGE is on,
-    otherwise send a plain channel message."""
+    otherwise send a plain channel message. Returns the sent message."""
     if cfg.get("ENABLE_REPLY_TO_MESSAGE", True):
-        await message.reply(text, mention_author=False)
-    else:
-        await message.channel.send(text)
+        return await message.reply(text, mention_author=False)
+    return await message.channel.send(text)
+
+
+def _strip_join_prefix(text: str) -> str:
+    """Remove a leading JOIN keyword from an LLM reply."""
+    clean = text.strip()
+    for pfx in ("JOIN ", "JOIN\n", "JOIN"):
+        if clean.upper().startswith(pfx):
+            return clean[len(pfx):].strip()
+    return clean
+
+
+class StreamingReply:
+    """Shows a streamed LLM reply in chat while it is still being generated.
+
+    The first chunk is posted as a reply as soon as it arrives; later chunks
+    edit that message at most once per LLM_STREAM_EDIT_INTERVAL_MS. When
+    *watch_join* is set, nothing is posted until the first word is known, and
+    a reply starting with JOIN is never shown - *on_join* is called instead so
+    the caller can start connecting to voice while the rest streams in.
+    """
+
+    def __init__(
+        self,
+        message: discord.Message,
+        watch_join: bool = False,
+        on_join: Callable[[], None] | None = None,
+    ):
+        self.message = message
+        self.sent: discord.Message | None = None
+        self.join_detected = False
+        self._watch_join = watch_join
+        self._on_join = on_join
+        self._interval = max(500, cfg.get("LLM_STREAM_EDIT_INTERVAL_MS", 1500)) / 1000
+        self._last_edit = 0.0
+        self._shown = ""
+        self._edit_task: asyncio.Task | None = None
+        self._failed = False
+
+    @staticmethod
+    def _display(text: str) -> str:
+        text = text.strip()
+        return text[:1990] + "..." if len(text) > 1990 else text
+
+    def _first_word_pending(self, text: str) -> bool:
+        """Return True while the reply could still turn out to start with JOIN."""
+        stripped = text.lstrip()
+        words = stripped.split()
+        if not words:
+            return True
+        first = words[0]
+        complete = len(stripped) > len(first)
+        if first.upper().rstrip(",.!?:") == "JOIN" and complete:
+            self.join_detected = True
+            log("info", "[VOICE] JOIN detected from the first streamed tokens")
+            if self._on_join:
+                self._on_join()
+            return False
+        return not complete and "JOIN".startswith(first.upper())
+
+    async def update(self, text: str):
+        """on_stream callback for query_llm: *text* is the reply accumulated so far."""
+        if self.join_detected or self._failed:
+            return
+        if self.sent is None and self._watch_join and self._first_word_pending(text):
+            return
+        if self.join_detected:
+            return
+
+        display = self._display(text)
+        if not display:
+            return
+
+        if self.sent is None:
+            try:
+                self.sent = await bot_reply(self.message, display)
+            except discord.HTTPException as e:
+                log("warning", f"[LLM-STREAM] Could not post first chunk: {e}")
+                self._failed = True
+                return
+            self._shown = display
+            self._last_edit = time.monotonic()
+            return
+
+        # Skip this chunk if an edit is still in flight or the cadence hasn't elapsed;
+        # finish() always writes the final text.
+        if self._edit_task and not self._edit_task.done():
+            return
+        if time.monotonic() - self._last_edit < self._interval or display == self._shown:
+            return
+        self._last_edit = time.monotonic()
+        self._edit_task = asyncio.create_task(self._edit(display))
+
+    async def _edit(self, display: str):
+        try:
+            await self.sent.edit(content=display)
+            self._shown = display
+        except discord.HTTPException as e:
+            log("warning", f"[LLM-STREAM] Edit failed: {e}")
+
+    async def finish(self, text: str) -> bool:
+        """Write the final text. Returns True if the reply was delivered by streaming."""
+        if self._edit_task and not self._edit_task.done():
+            await self._edit_task
+        if self.sent is None or self.join_detected:
+            return False
+        display = self._display(text)
+        if display and display != self._shown:
+            await self._edit(display)
+        return True
 
 
 async def handle_llm_mention(
     message: discord.Message,
     prompt: str,
     user_identity: str,
+    source: str = "MENTION",
 ):
-    context_limit = cfg.get("LLM_CONTEXT_MESSAGES", 20)
+    started = time.monotonic()
+    # Every call runs in its own task (event dispatch / debounce timer), so this
+    # trace id covers exactly this request and whatever it spawns.
+    _event_trace.set(message.id)
+    mark_summary_channel(message.channel.id)
+    event("mention_received", source=source, user=message.author.id, channel=message.channel.id,
+          guild=message.guild.id if message.guild else None, prompt_chars=len(prompt),
+          age_ms=round((datetime.now(timezone.utc) - message.created_at).total_seconds() * 1000, 1))
+
+    limit = llm_rate_limited(message)
+    if limit:
+        log("info", f"[LLM-RATELIMIT] {user_identity} hit the {limit} limit")
+        event("rate_limited", scope=limit)
+        if msgs.mention:
+            fallback = random.choice(msgs.mention)
+            try:
+                await bot_reply(message, fallback)
+                log("info", f"[LLM-RATELIMIT-REPLY] BOT - {message.author} | {fallback!r}")
+                event("fallback_used", dur_ms=ms_since(started), reason="rate_limited")
+            except discord.Forbidden:
+                pass
+        return
+
+    summary, context_limit = summary_context(message.channel.id, message.id)
     guild = message.guild
     channel_name = getattr(message.channel, "name", "")
 
@@ -2694,19 +5605,25 @@ async def handle_llm_mention(
     # Collect images if vision is enabled
     images = []
     if cfg.get("ENABLE_LLM_VISION") and cfg.get("ENABLE_LLM"):
+        stage = time.monotonic()
         images = await collect_message_images(
             message, cfg.get("LLM_VISION_MAX_MB", 10)
         )
+        event("images_collected", dur_ms=ms_since(stage), count=len(images))
 
     # Prepend vision context to prompt if images found
     if images:
         prompt = f"[The user sent {len(images)} image(s). Describe and respond to them.]\n" + prompt
 
+    stage = time.monotonic()
     history = await fetch_channel_context(
         message.channel, message, bot.user,
         limit=context_limit,
         guild=guild,
     )
+    event("context_fetched", dur_ms=ms_since(stage), messages=len(history),
+          tokens=sum(approx_tokens(m["content"]) for m in history) if event_log else None,
+          summary=bool(summary))
 
     # Build voice capability context if voice is enabled
     voice_extra = ""
@@ -2728,7 +5645,36 @@ async def handle_llm_mention(
                 "but this user is not currently in one."
             )
 
+    voice_possible = (
+        cfg.get("ENABLE_VOICE")
+        and voice_manager is not None
+        and message.guild is not None
+    )
+
+    # With streaming on, a JOIN reply lets us start connecting to voice while the
+    # rest of the text is still being generated.
+    early_join: asyncio.Task | None = None
+
+    def _start_early_join():
+        nonlocal early_join
+        if voice_possible and author_vc and author_vc.channel and early_join is None:
+            log("info", f"[VOICE] Early join (streamed JOIN) from {user_identity} → #{author_vc.channel.name}")
+            early_join = asyncio.create_task(voice_manager.join_voice(
+                guild_id=message.guild.id,
+                voice_channel=author_vc.channel,
+                text_channel=None,
+                llm_response="",
+                mode="invited",
+            ))
+
+    priority = LLM_PRIORITY_WINDOW if source == "WINDOW" else LLM_PRIORITY_MENTION
+    streamer = (
+        StreamingReply(message, watch_join=bool(voice_possible), on_join=_start_early_join)
+        if cfg.get("LLM_STREAMING") else None
+    )
+
     try:
+        stage = time.monotonic()
         if cfg["LLM_TYPING_INDICATOR"]:
             async with message.channel.typing():
                 response = await query_llm(
@@ -2736,6 +5682,10 @@ async def handle_llm_mention(
                     channel_name=channel_name,
                     extra_system_prompt=voice_extra,
                     images=images,
+                    on_stream=streamer.update if streamer else None,
+                    priority=priority,
+                    user_id=message.author.id,
+                    summary=summary,
                 )
         else:
             response = await query_llm(
@@ -2743,22 +5693,43 @@ async def handle_llm_mention(
                 channel_name=channel_name,
                 extra_system_prompt=voice_extra,
                 images=images,
+                on_stream=streamer.update if streamer else None,
+                priority=priority,
+                user_id=message.author.id,
+                summary=summary,
             )
 
+        event("llm_reply", dur_ms=ms_since(stage), ok=bool(response), images=len(images))
         if not response:
             raise ValueError("Empty response from LLM")
 
+        if streamer and await streamer.finish(response):
+            log("info", f"[LLM-REPLY] BOT - {message.author} | {response!r} (streamed)")
+            event("reply_sent", dur_ms=ms_since(started), path="streamed", chars=len(response))
+            return
+
         # Check if the LLM decided to join voice
         first_word = response.strip().split()[0].upper().rstrip(",.!?:") if response.strip() else ""
-        if (
-            first_word == "JOIN"
-            and cfg.get("ENABLE_VOICE")
-            and voice_manager is not None
-            and message.guild is not None
-        ):
+        if first_word == "JOIN" and voice_possible:
             log("info", f"[VOICE] LLM decided to JOIN from regular mention | full: {response!r}")
-            if author_vc and author_vc.channel:
+            if early_join is not None:
+                # Connection already started while streaming — just post the text.
+                clean = _strip_join_prefix(response)
+                if clean:
+                    try:
+                        await message.channel.send(clean[:1990])
+                        event("reply_sent", dur_ms=ms_since(started), path="join", chars=len(clean[:1990]))
+                    except discord.Forbidden:
+                        pass
+                joined = await early_join
+                if not joined:
+                    try:
+                        await message.channel.send("ugh, tried to join but Discord had other plans. typical.")
+                    except discord.Forbidden:
+                        pass
+            elif author_vc and author_vc.channel:
                 log("info", f"[VOICE] Accepting (via mention) from {user_identity} → #{author_vc.channel.name}")
+                event("reply_sent", dur_ms=ms_since(started), path="join", chars=len(response))
                 joined = await voice_manager.join_voice(
                     guild_id=message.guild.id,
                     voice_channel=author_vc.channel,
@@ -2773,29 +5744,29 @@ async def handle_llm_mention(
                         pass
             else:
                 # LLM wanted to join but user isn't in VC — strip JOIN and respond normally
-                clean = response.strip()
-                for pfx in ("JOIN ", "JOIN\n", "JOIN"):
-                    if clean.upper().startswith(pfx):
-                        clean = clean[len(pfx):].strip()
-                        break
+                clean = _strip_join_prefix(response)
                 reply = clean if clean else "bro get in a voice channel first, i'm not a magician"
                 if len(reply) > 1990:
                     reply = reply[:1990] + "..."
                 try:
                     await message.channel.send(reply)
                     log("info", f"[LLM-REPLY] BOT - {message.author} | {reply!r}")
+                    event("reply_sent", dur_ms=ms_since(started), path="reply", chars=len(reply))
                 except discord.Forbidden:
                     pass
         else:
             # Normal response — send as-is
             if len(response) > 1990:
                 response = response[:1990] + "..."
+            stage = time.monotonic()
             await bot_reply(message, response)
             log("info", f"[LLM-REPLY] BOT - {message.author} | {response!r}")
+            event("reply_sent", dur_ms=ms_since(started), send_ms=ms_since(stage), path="reply", chars=len(response))
 
     except Exception as e:
         print(f"❌ LLM mention handler error: {e}")
         log("warning", f"[LLM-ERROR] {user_identity} | {e}")
+        event("llm_error", dur_ms=ms_since(started), error=str(e)[:200])
         if cfg["LLM_FALLBACK_ON_ERROR"]:
             fallback = cfg.get("LLM_FALLBACK_MSG", "").strip()
             if not fallback and msgs.mention:
@@ -2804,6 +5775,7 @@ async def handle_llm_mention(
                 try:
                     await bot_reply(message, fallback)
                     log("info", f"[LLM-FALLBACK] BOT - {message.author} | {fallback!r}")
+                    event("fallback_used", dur_ms=ms_since(started), reason="llm_error")
                 except discord.Forbidden:
                     pass
 
@@ -2846,12 +5818,14 @@ async def greet_new_member(member: discord.Member) -> None:
                         prompt, user_identity, history,
                         extra_system_prompt=GREETING_PROMPT_EXTRA,
                         channel_name=getattr(channel, "name", ""),
+                        priority=LLM_PRIORITY_GREETING,
                     )
             else:
                 response = await query_llm(
                     prompt, user_identity, history,
                     extra_system_prompt=GREETING_PROMPT_EXTRA,
                     channel_name=getattr(channel, "name", ""),
+                    priority=LLM_PRIORITY_GREETING,
                 )
 
             if response:
@@ -2919,6 +5893,24 @@ async def on_member_remove(member: discord.Member):
             print(f"❌ Chicken-out channel not found (ID: {cfg['CHICKEN_OUT_CHANNEL_ID']}).")
 
 
+@bot.event
+async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+    if voice_manager is not None:
+        voice_manager.on_voice_state_update(member, before, after)
+
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if member_display_name(before) != member_display_name(after):
+        invalidate_display_name(after.id, after.guild.id)
+
+
+@bot.event
+async def on_user_update(before: discord.User, after: discord.User):
+    if (before.name, before.global_name) != (after.name, after.global_name):
+        invalidate_display_name(after.id)
+
+
 @bot.event
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
     msg = f"❌ Command error: {error}"
@@ -2967,6 +5959,24 @@ async def suggest_msg(interaction: discord.Interaction, message: str):
     await post_suggestion(interaction, message)
 
 
+@bot.tree.command(name="command-stats",
+                  description="Show which prefix commands are used most (admin only)",
+                  guild=_GUILD)
+@app_commands.default_permissions(administrator=True)
+async def command_stats(interaction: discord.Interaction):
+    prefix = cfg.get("COMMAND_PREFIX", "!")
+    top = prefix_commands.hits.most_common(15)
+    lines = [f"`{prefix}{name}` - {count}" for name, count in top] or ["*(no commands used since startup)*"]
+    unused = [n for n in prefix_commands.names() if n not in prefix_commands.hits]
+    aliases = ", ".join(f"`{a}`→`{t}`" for a, t in sorted(prefix_commands.aliases.items()))
+    await interaction.response.send_message(
+        "**Prefix command usage since startup**\n" + "\n".join(lines)
+        + (f"\n**Unused:** {', '.join(f'`{n}`' for n in unused)}" if unused else "")
+        + (f"\n**Aliases:** {aliases}" if aliases else ""),
+        ephemeral=True,
+    )
+
+
 @bot.tree.command(name="reload-msgs",
                   description="Reload message lists from disk (admin only)",
                   guild=_GUILD)
@@ -2980,9 +5990,24 @@ async def reload_msgs(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="clear-memory",
-                  description="Bot memory is now the live channel history - nothing to clear!",
+                  description="Forget this channel's conversation summary",
                   guild=_GUILD)
 async def clear_memory(interaction: discord.Interaction):
+    if cfg.get("ENABLE_LLM_SUMMARY"):
+        if await summaries.remove(interaction.channel_id):
+            llm_cache.clear()
+            log("info", f"[SUMMARY] Cleared by {interaction.user} in channel {interaction.channel_id}")
+            await interaction.response.send_message(
+                "🧠 Forgot the summary of this channel. I still see the last few messages.",
+                ephemeral=True,
+            )
+        else:
+            await interaction.response.send_message(
+                "🧠 There's no summary for this channel yet - nothing to clear.",
+                ephemeral=True,
+            )
+        return
+
     await interaction.response.send_message(
         "🧠 Memory is now the **live channel history** - I read the last "
         f"{cfg.get('LLM_CONTEXT_MESSAGES', 20)} messages every time you ping me, "
@@ -3006,140 +6031,155 @@ async def llm_status(interaction: discord.Interaction):
     model    = cfg["LLM_MODEL"]
     api_key  = cfg.get("LLM_API_KEY", "")
     key_hint = f"`...{api_key[-4:]}`" if len(api_key) >= 4 else ("*(none)*" if not api_key else "`set`")
+    extras   = f"\n**Vision:** {'✅ enabled' if cfg.get('ENABLE_LLM_VISION') else '❌ disabled'}"
+    if cfg.get("ENABLE_LLM_CACHE"):
+        extras += f"\n**Reply cache:** {llm_cache.stats()}"
+    extras += f"\n**Queue:** {llm_scheduler.stats()}"
+    if _llm_prompt_tokens["prompt"]:
+        share = _llm_prompt_tokens["cached"] / _llm_prompt_tokens["prompt"]
+        extras += (f"\n**Prompt cache:** {_llm_prompt_tokens['cached']:,} of "
+                   f"{_llm_prompt_tokens['prompt']:,} prompt tokens cached ({share:.0%})")
+    chain = llm_targets()
+    if len(chain) > 1:
+        extras += "\n**Failover chain:** " + " → ".join(
+            f"`{t['name']}` {provider_health(t).describe()}" for t in chain
+        )
+        if cfg.get("ENABLE_LLM_HEDGING"):
+            extras += f"\n**Hedging:** after {_hedge_delay(chain[0]):.1f}s"
 
     try:
         timeout = aiohttp.ClientTimeout(total=10)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-
-            if provider == "ollama":
-                async with session.get(f"{base_url}/api/tags") as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send(f"⚠️ Ollama responded with HTTP {resp.status}", ephemeral=True)
-                        return
-                    data   = await resp.json()
-                    models = [m["name"] for m in data.get("models", [])]
-                    model_list  = ", ".join(models) if models else "none"
-                    is_available = any(model in m for m in models)
-                    status = "✅ found" if is_available else "⚠️ not found in list"
+        session = get_http_session()
+
+        if provider == "ollama":
+            async with session.get(f"{base_url}/api/tags", timeout=timeout) as resp:
+                if resp.status != 200:
+                    await interaction.followup.send(f"⚠️ Ollama responded with HTTP {resp.status}", ephemeral=True)
+                    return
+                data   = await resp.json()
+                models = [m["name"] for m in data.get("models", [])]
+                model_list  = ", ".join(models) if models else "none"
+                is_available = any(model in m for m in models)
+                status = "✅ found" if is_available else "⚠️ not found in list"
+                await interaction.followup.send(
+                    f"**Provider:** Ollama ✅ Connected\n"
+                    f"**Active model:** `{model}` - {status}\n"
+                    f"**Installed models:** `{model_list}`"
+                    + extras,
+                    ephemeral=True,
+                )
+
+        elif provider in ("openai", "lmstudio", "groq", "openrouter", "openai_compat"):
+            headers = {}
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            url = f"{base_url.rstrip('/')}/v1/models"
+            async with session.get(url, headers=headers, timeout=timeout) as resp:
+                if resp.status != 200:
                     await interaction.followup.send(
-                        f"**Provider:** Ollama ✅ Connected\n"
-                        f"**Active model:** `{model}` - {status}\n"
-                        f"**Installed models:** `{model_list}`"
-                        f"\n**Vision:** {'✅ enabled' if cfg.get('ENABLE_LLM_VISION') else '❌ disabled'}",
+                        f"⚠️ {provider.upper()} responded with HTTP {resp.status}\n"
+                        f"`{await resp.text()[:300]}`",
                         ephemeral=True,
                     )
+                    return
+                data = await resp.json()
+                model_ids = [m.get("id", "?") for m in data.get("data", [])]
+                model_list = ", ".join(model_ids[:15]) + ("..." if len(model_ids) > 15 else "")
+                is_available = any(model in mid for mid in model_ids)
+                status = "✅ found" if is_available else "⚠️ not in list"
+                await interaction.followup.send(
+                    f"**Provider:** {provider.upper()} ✅ Connected\n"
+                    f"**Base URL:** `{base_url}`\n"
+                    f"**Active model:** `{model}` - {status}\n"
+                    f"**API key:** {key_hint}\n"
+                    f"**Available models (sample):** `{model_list or 'none returned'}`"
+                    + extras,
+                    ephemeral=True,
+                )
 
-            elif provider in ("openai", "lmstudio", "groq", "openrouter", "openai_compat"):
-                headers = {}
-                if api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-                url = f"{base_url.rstrip('/')}/v1/models"
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send(
-                            f"⚠️ {provider.upper()} responded with HTTP {resp.status}\n"
-                            f"`{await resp.text()[:300]}`",
-                            ephemeral=True,
-                        )
-                        return
-                    data = await resp.json()
-                    model_ids = [m.get("id", "?") for m in data.get("data", [])]
-                    model_list = ", ".join(model_ids[:15]) + ("..." if len(model_ids) > 15 else "")
-                    is_available = any(model in mid for mid in model_ids)
-                    status = "✅ found" if is_available else "⚠️ not in list"
+        elif provider == "openmodel":
+            headers = {}
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            url = f"{base_url.rstrip('/')}/v1/models"
+            async with session.get(url, headers=headers, timeout=timeout) as resp:
+                if resp.status != 200:
                     await interaction.followup.send(
-                        f"**Provider:** {provider.upper()} ✅ Connected\n"
-                        f"**Base URL:** `{base_url}`\n"
-                        f"**Active model:** `{model}` - {status}\n"
-                        f"**API key:** {key_hint}\n"
-                        f"**Available models (sample):** `{model_list or 'none returned'}`"
-                        f"\n**Vision:** {'✅ enabled' if cfg.get('ENABLE_LLM_VISION') else '❌ disabled'}",
+                        f"⚠️ OpenModel responded with HTTP {resp.status}\n"
+                        f"`{await resp.text()[:300]}`",
+                        ephemeral=True,
+                    )
+                    return
+                data = await resp.json()
+                model_ids = [m.get("id", "?") for m in data.get("data", [])]
+                model_list = ", ".join(model_ids[:15]) + ("..." if len(model_ids) > 15 else "")
+                is_available = any(model in mid for mid in model_ids)
+                status = "✅ found" if is_available else "⚠️ not in list"
+                await interaction.followup.send(
+                    f"**Provider:** OpenModel ✅ Connected\n"
+                    f"**Base URL:** `{base_url}`\n"
+                    f"**Active model:** `{model}` - {status}\n"
+                    f"**API key:** {key_hint}\n"
+                    f"**Available models (sample):** `{model_list or 'none returned'}`"
+                    + extras,
+                    ephemeral=True,
+                )
+
+        elif provider == "anthropic":
+            url = f"{base_url.rstrip('/')}/v1/messages"
+            headers = {
+                "x-api-key": api_key,
+                "anthropic-version": "2023-06-01",
+                "Content-Type": "application/json",
+            }
+            payload = {
+                "model": model,
+                "max_tokens": 8,
+                "messages": [{"role": "user", "content": "ping"}],
+            }
+            async with session.post(url, json=payload, headers=headers, timeout=timeout) as resp:
+                if resp.status == 200:
+                    await interaction.followup.send(
+                        f"**Provider:** Anthropic ✅ Connected\n"
+                        f"**Model:** `{model}`\n"
+                        f"**API key:** {key_hint}"
+                        + extras,
+                        ephemeral=True,
+                    )
+                else:
+                    await interaction.followup.send(
+                        f"⚠️ Anthropic HTTP {resp.status}: `{await resp.text()[:300]}`",
                         ephemeral=True,
                     )
 
-            elif provider == "openmodel":
-                headers = {}
-                if api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-                url = f"{base_url.rstrip('/')}/v1/models"
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send(
-                            f"⚠️ OpenModel responded with HTTP {resp.status}\n"
-                            f"`{await resp.text()[:300]}`",
-                            ephemeral=True,
-                        )
-                        return
+        elif provider == "gemini":
+            url = f"{base_url.rstrip('/')}/v1beta/models?key={api_key}"
+            async with session.get(url, timeout=timeout) as resp:
+                if resp.status == 200:
                     data = await resp.json()
-                    model_ids = [m.get("id", "?") for m in data.get("data", [])]
+                    model_ids = [m.get("name", "?").split("/")[-1] for m in data.get("models", [])]
                     model_list = ", ".join(model_ids[:15]) + ("..." if len(model_ids) > 15 else "")
                     is_available = any(model in mid for mid in model_ids)
                     status = "✅ found" if is_available else "⚠️ not in list"
                     await interaction.followup.send(
-                        f"**Provider:** OpenModel ✅ Connected\n"
-                        f"**Base URL:** `{base_url}`\n"
+                        f"**Provider:** Gemini ✅ Connected\n"
                         f"**Active model:** `{model}` - {status}\n"
                         f"**API key:** {key_hint}\n"
                         f"**Available models (sample):** `{model_list or 'none returned'}`"
-                        f"\n**Vision:** {'✅ enabled' if cfg.get('ENABLE_LLM_VISION') else '❌ disabled'}",
+                        + extras,
+                        ephemeral=True,
+                    )
+                else:
+                    await interaction.followup.send(
+                        f"⚠️ Gemini HTTP {resp.status}: `{await resp.text()[:300]}`",
                         ephemeral=True,
                     )
 
-            elif provider == "anthropic":
-                url = f"{base_url.rstrip('/')}/v1/messages"
-                headers = {
-                    "x-api-key": api_key,
-                    "anthropic-version": "2023-06-01",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "model": model,
-                    "max_tokens": 8,
-                    "messages": [{"role": "user", "content": "ping"}],
-                }
-                async with session.post(url, json=payload, headers=headers) as resp:
-                    if resp.status == 200:
-                        await interaction.followup.send(
-                            f"**Provider:** Anthropic ✅ Connected\n"
-                            f"**Model:** `{model}`\n"
-                            f"**API key:** {key_hint}"
-                            f"\n**Vision:** {'✅ enabled' if cfg.get('ENABLE_LLM_VISION') else '❌ disabled'}",
-                            ephemeral=True,
-                        )
-                    else:
-                        await interaction.followup.send(
-                            f"⚠️ Anthropic HTTP {resp.status}: `{await resp.text()[:300]}`",
-                            ephemeral=True,
-                        )
-
-            elif provider == "gemini":
-                url = f"{base_url.rstrip('/')}/v1beta/models?key={api_key}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        model_ids = [m.get("name", "?").split("/")[-1] for m in data.get("models", [])]
-                        model_list = ", ".join(model_ids[:15]) + ("..." if len(model_ids) > 15 else "")
-                        is_available = any(model in mid for mid in model_ids)
-                        status = "✅ found" if is_available else "⚠️ not in list"
-                        await interaction.followup.send(
-                            f"**Provider:** Gemini ✅ Connected\n"
-                            f"**Active model:** `{model}` - {status}\n"
-                            f"**API key:** {key_hint}\n"
-                            f"**Available models (sample):** `{model_list or 'none returned'}`"
-                            f"\n**Vision:** {'✅ enabled' if cfg.get('ENABLE_LLM_VISION') else '❌ disabled'}",
-                            ephemeral=True,
-                        )
-                    else:
-                        await interaction.followup.send(
-                            f"⚠️ Gemini HTTP {resp.status}: `{await resp.text()[:300]}`",
-                            ephemeral=True,
-                        )
-
-            else:
-                await interaction.followup.send(
-                    f"❓ Unknown provider `{provider}` - cannot test connection.",
-                    ephemeral=True,
-                )
+        else:
+            await interaction.followup.send(
+                f"❓ Unknown provider `{provider}` - cannot test connection.",
+                ephemeral=True,
+            )
 
     except aiohttp.ClientConnectorError as e:
         await interaction.followup.send(f"❌ Cannot reach `{base_url}`: `{e}`", ephemeral=True)
@@ -3174,7 +6214,7 @@ async def birthday_set(interaction: discord.Interaction, month: int, day: int):
         )
         return
 
-    birthdays.set(interaction.user.id, month, day)
+    await birthdays.set(interaction.user.id, month, day)
     month_str = BirthdayStore.month_name(month)
     await interaction.response.send_message(
         f"🎂 Your birthday has been set to **{month_str} {day}**!", ephemeral=True
@@ -3188,7 +6228,7 @@ async def birthday_remove(interaction: discord.Interaction):
         await interaction.response.send_message("❌ Birthdays are disabled.", ephemeral=True)
         return
 
-    removed = birthdays.remove(interaction.user.id)
+    removed = await birthdays.remove(interaction.user.id)
     if removed:
         await interaction.response.send_message("✅ Your birthday has been removed.", ephemeral=True)
         log("info", f"[BIRTHDAY-REMOVE] {interaction.user} ({interaction.user.id}) removed birthday")
@@ -3318,7 +6358,7 @@ async def birthday_remove_user(interaction: discord.Interaction, member: discord
         await interaction.response.send_message("❌ Birthdays are disabled.", ephemeral=True)
         return
 
-    removed = birthdays.remove(member.id)
+    removed = await birthdays.remove(member.id)
     if removed:
         await interaction.response.send_message(
             f"✅ Removed birthday for {member.mention}.", ephemeral=True
@@ -3422,20 +6462,44 @@ async def demotivator(
         )
         return
 
-    await interaction.response.defer()
+    global _demotivator_pending
+    user_id = interaction.user.id
+    if _demotivator_pending >= cfg["DEMOTIVATOR_MAX_QUEUE"]:
+        await interaction.response.send_message(
+            "⏳ Too many posters in the oven right now. Try again in a bit.", ephemeral=True
+        )
+        return
+    if _demotivator_per_user.get(user_id, 0) >= cfg["DEMOTIVATOR_PER_USER_LIMIT"]:
+        await interaction.response.send_message(
+            "⏳ Your previous poster is still being made.", ephemeral=True
+        )
+        return
 
+    # Reserve the slot before the first await so concurrent invocations can't
+    # all pass the checks above.
+    _demotivator_pending += 1
+    _demotivator_per_user[user_id] = _demotivator_per_user.get(user_id, 0) + 1
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image.url) as resp:
-                if resp.status != 200:
-                    await interaction.followup.send("❌ Couldn't download the image.")
-                    return
-                img_bytes = await resp.read()
+        await interaction.response.defer()
+
+        session = get_http_session()
+        async with session.get(image.url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            if resp.status != 200:
+                await interaction.followup.send("❌ Couldn't download the image.")
+                return
+            img_bytes = await resp.read()
+
+        error = _check_image_dimensions(img_bytes)
+        if error:
+            await interaction.followup.send(error)
+            return
 
-        photo        = Image.open(io.BytesIO(img_bytes))
-        poster_bytes = _build_demotivator(photo, title, subtitle)
+        loop = asyncio.get_running_loop()
+        poster_bytes = await loop.run_in_executor(
+            _demotivator_executor, _render_demotivator, img_bytes, title, subtitle
+        )
 
-        file = discord.File(fp=io.BytesIO(poster_bytes), filename="demotivator.png")
+        file = discord.File(fp=io.BytesIO(poster_bytes), filename=f"demotivator.{_demotivator_extension()}")
         await interaction.followup.send(file=file)
 
         log("info", f"[DEMOTIVATOR] {interaction.user} | title={title!r} | sub={subtitle!r}")
@@ -3443,6 +6507,13 @@ async def demotivator(
     except Exception as e:
         log("error", f"[DEMOTIVATOR] {e}")
         await interaction.followup.send("❌ Something broke while making the poster.")
+    finally:
+        _demotivator_pending -= 1
+        remaining = _demotivator_per_user.get(user_id, 1) - 1
+        if remaining > 0:
+            _demotivator_per_user[user_id] = remaining
+        else:
+            _demotivator_per_user.pop(user_id, None)
 
 
 # ============================================================
@@ -3502,6 +6573,7 @@ if __name__ == "__main__":
     print(f"   LLM                  : {'✅ ' + cfg['LLM_PROVIDER'].upper() + ' / ' + cfg['LLM_MODEL'] + (' ☁️' if cfg['LLM_PROVIDER'] == 'ollama_cloud' else '') if cfg['ENABLE_LLM'] else '❌ disabled'}")
     print(f"   Context messages     : last {cfg['LLM_CONTEXT_MESSAGES']} channel msgs per response")
     print(f"   Logging              : {'✅ ' + cfg['LOG_DIR'] + '/' + cfg['LOG_FILE'] if cfg['ENABLE_LOGGING'] else '❌ disabled'}")
+    print(f"   Event log            : {'✅ ' + cfg['LOG_DIR'] + '/' + cfg['EVENT_LOG_FILE'] if cfg['ENABLE_EVENT_LOG'] else '❌ disabled'}")
     print(f"   Shitpost             : {'✅ every ' + str(cfg['SHITPOST_INTERVAL_MINUTES']) + ' min - ch ' + str(cfg['SHITPOST_CHANNEL_ID']) if cfg['ENABLE_SHITPOST'] else '❌ disabled'}")
     hb_url = cfg.get("HEARTBEAT_URL", "").strip()
     print(f"   Heartbeat            : {'✅ every ' + str(cfg['HEARTBEAT_INTERVAL_SECONDS']) + 's → ' + hb_url if hb_url else '❌ disabled'}")
@@ -3519,12 +6591,7 @@ if __name__ == "__main__":
         print(f"   Birthdays            : ❌ disabled")
 
     if cfg.get("ENABLE_VOICE"):
-        sounds_folder = BOT_DIR / cfg.get("SOUNDS_FOLDER", "sounds")
-        sound_count = len([
-            p for p in sounds_folder.iterdir()
-            if p.is_file() and p.suffix.lower() in {".mp3", ".ogg", ".wav", ".flac"}
-        ]) if sounds_folder.exists() else 0
-        print(f"   Voice                : ✅ sounds={sound_count} | "
+        print(f"   Voice                : ✅ sounds={len(sound_library)} indexed | "
               f"folder={cfg['SOUNDS_FOLDER']} | "
               f"interval={cfg['VOICE_SOUND_INTERVAL_BASE']}±{cfg['VOICE_SOUND_INTERVAL_VARIANCE']}s | "
               f"alone-timeout={cfg['VOICE_ALONE_DISCONNECT_SECONDS']}s")